@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Stage-level benchmark suite for scripts/process_images.py
+
+Generates reproducible synthetic phone screenshots (status bars, scrollable
+sequences, near-duplicates) and times each pipeline stage:
+detect_status_bar_region, create_text_mask, inpaint_status_bar,
+extract_features, group_related_images and the full process_all_images.
+The hamming_matcher stage times HammingMatcher against per-pair
+cross-checked BFMatcher and fails the run if any score differs.
+
+Usage:
+    python scripts/benchmark_images.py                      # 50, 500, 5000 images
+    python scripts/benchmark_images.py --sizes 50 --save-baseline bench_baseline.json
+    python scripts/benchmark_images.py --sizes 50 --compare bench_baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from process_images import EnhancedImageProcessor  # noqa: E402
+
+# Bump when the generator changes so cached corpora are rebuilt
+CORPUS_VERSION = 1
+
+PER_IMAGE_STAGES = ["detect_status_bar_region", "create_text_mask", "inpaint_status_bar", "extract_features"]
+SET_STAGES = ["hamming_matcher", "group_related_images", "process_all_images"]
+
+
+def draw_status_bar(image: np.ndarray, rng: np.random.Generator) -> None:
+    """Bottom status band with clock, signal bars and battery (as the processor expects)."""
+    height, width = image.shape[:2]
+    bar_height = max(24, int(height * 0.04))
+    top = height - bar_height
+    image[top:] = (248, 248, 248) if rng.random() < 0.7 else tuple(int(c) for c in rng.integers(0, 255, 3))
+
+    scale = bar_height / 40
+    clock = f"{rng.integers(0, 24):02d}:{rng.integers(0, 60):02d}"
+    cv2.putText(image, clock, (int(width * 0.04), height - bar_height // 3),
+                cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 200), 2)
+    for i in range(4):
+        x = int(width * 0.7) + i * int(bar_height * 0.3)
+        cv2.rectangle(image, (x, height - bar_height // 4 - i * bar_height // 8),
+                      (x + bar_height // 6, height - bar_height // 4), (30, 30, 30), -1)
+    bx = int(width * 0.86)
+    cv2.rectangle(image, (bx, top + bar_height // 3), (bx + bar_height, height - bar_height // 3), (30, 30, 30), 2)
+    cv2.rectangle(image, (bx + 3, top + bar_height // 3 + 3),
+                  (bx + int(bar_height * rng.uniform(0.3, 0.9)), height - bar_height // 3 - 3), (0, 160, 0), -1)
+
+
+def draw_content(canvas: np.ndarray, rng: np.random.Generator, label: str) -> None:
+    """App-like content: cards with text lines and icons."""
+    height, width = canvas.shape[:2]
+    y = int(rng.integers(10, 40))
+    while y < height - 80:
+        card_height = int(rng.integers(60, 220))
+        color = tuple(int(c) for c in rng.integers(180, 256, 3))
+        cv2.rectangle(canvas, (16, y), (width - 16, y + card_height), color, -1)
+        cv2.circle(canvas, (48, y + 32), 18, tuple(int(c) for c in rng.integers(0, 200, 3)), -1)
+        for line in range(max(1, card_height // 30)):
+            text = f"{label} item {int(rng.integers(0, 1000))}"
+            cv2.putText(canvas, text, (80, y + 30 + line * 26), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.6, (40, 40, 40), 1)
+        y += card_height + int(rng.integers(8, 24))
+
+
+def make_screen(rng: np.random.Generator, width: int, height: int, label: str,
+                scroll_frames: int = 1, scroll_step: float = 0.35) -> List[np.ndarray]:
+    """One logical screen; scrollable screens yield several offset frames with a pinned header."""
+    step = int(height * scroll_step)
+    canvas = np.full((height + step * (scroll_frames - 1), width, 3), 255, dtype=np.uint8)
+    draw_content(canvas, rng, label)
+
+    header_height = int(height * 0.08)
+    header_color = tuple(int(c) for c in rng.integers(0, 200, 3))
+    frames = []
+    for i in range(scroll_frames):
+        frame = canvas[i * step:i * step + height].copy()
+        frame[:header_height] = header_color
+        cv2.putText(frame, label, (20, int(header_height * 0.65)), cv2.FONT_HERSHEY_SIMPLEX,
+                    header_height / 60, (255, 255, 255), 2)
+        draw_status_bar(frame, rng)
+        frames.append(frame)
+    return frames
+
+
+def generate_corpus(out_dir: Path, count: int, seed: int = 0, width: int = 540, height: int = 1170) -> Path:
+    """
+    Write count screenshots to out_dir (reused if already generated with the
+    same parameters). Roughly half are static screens, a third come from
+    scrollable sequences of 3-4 frames and the rest are near-duplicate retakes.
+    """
+    out_dir = Path(out_dir)
+    meta_path = out_dir / "corpus.json"
+    meta = {"version": CORPUS_VERSION, "count": count, "seed": seed, "width": width, "height": height}
+    if meta_path.exists() and json.loads(meta_path.read_text()) == meta:
+        return out_dir
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    out_dir.mkdir(parents=True)
+    rng = np.random.default_rng(seed)
+    written = 0
+    screen_idx = 0
+
+    while written < count:
+        kind = rng.choice(["static", "scrollable", "duplicate"], p=[0.5, 0.3, 0.2])
+        label = f"Screen {screen_idx}"
+        if kind == "scrollable":
+            frames = make_screen(rng, width, height, label, scroll_frames=int(rng.integers(3, 5)))
+        else:
+            frames = make_screen(rng, width, height, label)
+            if kind == "duplicate":
+                # Retakes: same screen, different clock and slight sensor noise
+                for _ in range(int(rng.integers(1, 3))):
+                    retake = frames[0].copy()
+                    draw_status_bar(retake, rng)
+                    noise = rng.integers(-2, 3, retake.shape, dtype=np.int16)
+                    frames.append(np.clip(retake.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+
+        for frame_idx, frame in enumerate(frames):
+            if written >= count:
+                break
+            # Timestamp/hash-style names exercise filename normalization
+            name = (f"{kind}{screen_idx}_2025{rng.integers(1, 13):02d}15_{frame_idx}_"
+                    f"{rng.integers(10**11, 10**12)}.png")
+            cv2.imwrite(str(out_dir / name), frame)
+            written += 1
+        screen_idx += 1
+
+    meta_path.write_text(json.dumps(meta))
+    return out_dir
+
+
+def time_calls(fn: Callable, inputs: List) -> Dict[str, float]:
+    """Wall-clock statistics for fn over inputs, in milliseconds per call."""
+    timings = []
+    for item in inputs:
+        started = time.perf_counter()
+        fn(item)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings = np.array(timings)
+    return {
+        "calls": len(timings),
+        "total_s": round(float(timings.sum()) / 1000, 4),
+        "mean_ms": round(float(timings.mean()), 3),
+        "p50_ms": round(float(np.percentile(timings, 50)), 3),
+        "p95_ms": round(float(np.percentile(timings, 95)), 3),
+    }
+
+
+def bf_similarity(matcher: cv2.BFMatcher, desc1: np.ndarray, desc2: np.ndarray) -> float:
+    """Per-pair score HammingMatcher reproduces: cross-checked matches closer than 50."""
+    if desc1.size == 0 or desc2.size == 0:
+        return 0.0
+    good = [m for m in matcher.match(desc1, desc2) if m.distance < 50]
+    return min(len(good) / min(len(desc1), len(desc2)), 1.0)
+
+
+def benchmark_matcher(processor: EnhancedImageProcessor, images: List[np.ndarray]) -> Dict:
+    """All-pairs similarity of images with BFMatcher and HammingMatcher; scores must match."""
+    descriptors = [processor.extract_features(image)[1] for image in images]
+    bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+
+    started = time.perf_counter()
+    expected = np.array([[bf_similarity(bf, a, b) for b in descriptors] for a in descriptors])
+    bf_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    scores = np.array([processor.matcher.similarities(a, descriptors) for a in descriptors])
+    matcher_s = time.perf_counter() - started
+
+    pairs = len(descriptors) ** 2
+    return {
+        "pairs": pairs,
+        "mismatches": int(np.count_nonzero(scores != expected)),
+        "bf_ms_per_pair": round(bf_s * 1000 / pairs, 3),
+        "mean_ms": round(matcher_s * 1000 / pairs, 3),
+        "speedup": round(bf_s / matcher_s, 2),
+    }
+
+
+def benchmark_size(corpus_dir: Path, sample: int, workers: int, stages: List[str]) -> Dict[str, Dict]:
+    """Time every requested stage on one corpus."""
+    results = {}
+    image_files = sorted(corpus_dir.glob("*.png"))
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # Fresh processor and cache so no stage is served from a previous run
+        processor = EnhancedImageProcessor(scratch, cache_dir=str(Path(scratch) / "features"),
+                                           profile_confirmations=0)
+        step = max(1, len(image_files) // sample)
+        sample_images = [cv2.imread(str(f)) for f in image_files[::step][:sample]]
+
+        if "detect_status_bar_region" in stages:
+            results["detect_status_bar_region"] = time_calls(processor.detect_status_bar_region, sample_images)
+
+        if "create_text_mask" in stages:
+            regions = []
+            for image in sample_images:
+                start, end = processor.detect_status_bar_region(image)
+                regions.append((image, image[start:end].copy()))
+            results["create_text_mask"] = time_calls(lambda pair: processor.create_text_mask(*pair), regions)
+
+        if "inpaint_status_bar" in stages:
+            results["inpaint_status_bar"] = time_calls(processor.inpaint_status_bar, sample_images)
+
+        if "extract_features" in stages:
+            results["extract_features"] = time_calls(processor.extract_features, sample_images)
+
+        if "hamming_matcher" in stages:
+            results["hamming_matcher"] = benchmark_matcher(processor, sample_images)
+
+        if "group_related_images" in stages:
+            # What group_related_images does, one frame at a time: each file is
+            # decoded and reduced to an ImageRecord, so memory stays flat at 5,000
+            records = {}
+            featurize_s = 0.0
+            for f in image_files:
+                image = cv2.imread(str(f))
+                started = time.perf_counter()
+                records[f.name] = processor.build_record(f.name, image)
+                featurize_s += time.perf_counter() - started
+                del image
+            started = time.perf_counter()
+            groups = processor.group_records(records)
+            group_s = time.perf_counter() - started
+            results["group_related_images"] = {"images": len(records), "groups": len(groups),
+                                               "featurize_s": round(featurize_s, 4),
+                                               "group_s": round(group_s, 4),
+                                               "total_s": round(featurize_s + group_s, 4)}
+
+    if "process_all_images" in stages:
+        with tempfile.TemporaryDirectory() as scratch:
+            screens_dir = Path(scratch) / "screens"
+            screens_dir.mkdir()
+            for f in image_files:
+                shutil.copy2(f, screens_dir / f.name)
+            processor = EnhancedImageProcessor(str(screens_dir), workers=workers, incremental=False)
+            started = time.perf_counter()
+            stats = processor.process_all_images()
+            results["process_all_images"] = {"images": len(image_files), "workers": workers, **stats,
+                                             "total_s": round(time.perf_counter() - started, 4)}
+
+    return results
+
+
+def compare_to_baseline(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Stages whose time grew by more than tolerance (fractional) over the baseline."""
+    regressions = []
+    for size, stages in results["sizes"].items():
+        for stage, current in stages.items():
+            previous = baseline.get("sizes", {}).get(size, {}).get(stage)
+            if not previous:
+                continue
+            metric = "mean_ms" if "mean_ms" in current else "total_s"
+            if previous.get(metric) and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{size} images / {stage}: {metric} {previous[metric]} -> {current[metric]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the screenshot processing pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000],
+                        help="Corpus sizes to benchmark (default: 50 500 5000)")
+    parser.add_argument("--stages", nargs="+", default=PER_IMAGE_STAGES + SET_STAGES,
+                        choices=PER_IMAGE_STAGES + SET_STAGES, help="Stages to time (default: all)")
+    parser.add_argument("--sample", type=int, default=50,
+                        help="Images per size used for the per-image stages (default: 50)")
+    parser.add_argument("--workers", type=int, default=1, help="Workers for process_all_images (default: 1)")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus random seed (default: 0)")
+    parser.add_argument("--width", type=int, default=540, help="Screenshot width (default: 540)")
+    parser.add_argument("--height", type=int, default=1170, help="Screenshot height (default: 1170)")
+    parser.add_argument("--corpus-dir", default=".bench", help="Where generated corpora are kept (default: .bench)")
+    parser.add_argument("--output", default="bench_output.json", help="Results file (default: bench_output.json)")
+    parser.add_argument("--save-baseline", help="Also write the results as a baseline to this path")
+    parser.add_argument("--compare", help="Baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown over the baseline before failing (default: 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    # Keep per-image log lines out of the timings
+    logging.basicConfig(level=logging.WARNING)
+
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "corpus": {"seed": args.seed, "width": args.width, "height": args.height, "version": CORPUS_VERSION},
+        "sizes": {},
+    }
+
+    for size in args.sizes:
+        print(f"📦 Generating corpus of {size} screenshots...")
+        corpus_dir = generate_corpus(Path(args.corpus_dir) / f"corpus_{size}_{args.seed}", size,
+                                     seed=args.seed, width=args.width, height=args.height)
+        print(f"⏱️ Benchmarking {size} screenshots...")
+        results["sizes"][str(size)] = benchmark_size(corpus_dir, min(args.sample, size), args.workers, args.stages)
+        for stage, stats in results["sizes"][str(size)].items():
+            if stage == "hamming_matcher":
+                timing = (f"{stats['mean_ms']} ms/pair ({stats['speedup']}x BFMatcher), "
+                          f"{stats['mismatches']} of {stats['pairs']} scores differ")
+            else:
+                timing = f"{stats['mean_ms']} ms/image" if "mean_ms" in stats else f"{stats['total_s']} s"
+            print(f"  {stage}: {timing}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"📄 Results saved to: {args.output}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"📌 Baseline saved to: {args.save_baseline}")
+
+    mismatched = [size for size, stages in results["sizes"].items()
+                  if stages.get("hamming_matcher", {}).get("mismatches")]
+    if mismatched:
+        print(f"❌ HammingMatcher scores differ from BFMatcher at sizes: {', '.join(mismatched)}")
+        sys.exit(1)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("❌ Performance regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,45 +10,1173 @@ Complete automation for:
 5. Batch processing for large image sets (70-100+ images)
 6. Comprehensive logging and error handling
 
-Usage: python scripts/process_images.py
+Usage: python scripts/process_images.py [process] [--screens-dir DIR] [--batch-size N] [--cache-dir DIR]
+                                        [--workers N] [--io-threads N] [--prefetch N] [--full] [--dry-run]
+                                        [--candidates K] [--recall-report] [--proxy-width W]
+                                        [--validate-proxies] [--variant-widths W,...] [--variant-formats F,...]
+                                        [--no-stitch] [--stitch-tile-height H] [--frame-store] [--no-dedup]
+                                        [--metrics] [--profile PATH]
+       python scripts/process_images.py watch [--interval S] [options]
+       python scripts/process_images.py shard I/N [options] | merge N [options]
+       python scripts/process_images.py restore [--screens-dir DIR]
+
+Sharded run (N processes on one box, or N machines with a copy of the screens directory):
+    for i in 0 1 2 3; do python scripts/process_images.py shard $i/4 & done; wait
+    python scripts/process_images.py merge 4
+
+Library use (no files written, nothing logged unless the caller configures logging):
+    from process_images import process_screenshots
+    for event in process_screenshots({"home.png": png_bytes, ...}):
+        ...  # "image" events, then "group" events, then the final "screens" event
 """
 
+from __future__ import annotations
+
 import os
 import re
+import sys
 import json
 import shutil
 import time
+import hashlib
+import argparse
+import importlib
+import base64
+import csv
+import queue
+import atexit
+import cProfile
+import itertools
+import threading
+import tracemalloc
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional, Set
-import cv2
-import numpy as np
-from PIL import Image
+from typing import (TYPE_CHECKING, Callable, Collection, Iterable, Iterator, List, Dict, Mapping, Tuple, Optional,
+                    Set, Union)
 import logging
+from logging.handlers import QueueHandler, QueueListener
+
+
+class _LazyModule:
+    """
+    Stand-in for a heavy module that imports it on first attribute access and
+    then takes its place in this module's globals, so the CLI's quick paths
+    (--dry-run, runs where nothing changed, restore) never load OpenCV or NumPy.
+    """
+
+    def __init__(self, name: str, alias: str):
+        self._name = name
+        self._alias = alias
+
+    def __getattr__(self, attr: str):
+        module = importlib.import_module(self._name)
+        globals()[self._alias] = module
+        return getattr(module, attr)
+
+
+cv2 = _LazyModule("cv2", "cv2")
+np = _LazyModule("numpy", "np")
+
+if TYPE_CHECKING:
+    # Imported where the pipeline starts its thread and process pools
+    from concurrent.futures import Future, ProcessPoolExecutor
+
+class FeatureCache:
+    """
+    Content-addressed on-disk cache of ORB keypoints/descriptors.
+
+    Entries are keyed by a hash of the decoded pixels plus the ORB parameters,
+    so each image is featurized once per lifetime and reused across runs.
+    Without a cache_dir entries live in memory only, and are never evicted.
+    """
+
+    def __init__(self, cache_dir: Optional[Path], params: Dict[str, int], max_memory_entries: int = 1024):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.params_key = "_".join(f"{k}{v}" for k, v in sorted(params.items()))
+        # Bounded LRU in front of the .npz files keeps memory flat for large captures
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._aliases: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def content_hash(image: np.ndarray) -> str:
+        """Hash of the pixel buffer and its shape."""
+        digest = hashlib.sha1(str(image.shape).encode())
+        digest.update(np.ascontiguousarray(image).data)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}_{self.params_key}.npz"
+
+    def alias(self, key: str, target: str) -> None:
+        """
+        Serve key from target's entry, e.g. a re-decoded JPEG output from the
+        features computed on its in-memory pixels before encoding.
+        """
+        if key != target:
+            self._aliases[key] = target
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        key = self._aliases.get(key, key)
+        if key in self._memory:
+            self.hits += 1
+            self._memory.move_to_end(key)
+            return self._memory[key]
+
+        path = self._path(key) if self.cache_dir is not None else None
+        if path is None or not path.exists():
+            self.misses += 1
+            return None
+
+        try:
+            with np.load(path) as data:
+                entry = (data["keypoints"], data["descriptors"])
+        except Exception:
+            # Corrupt/partial entry: treat as a miss and let it be rewritten
+            self.misses += 1
+            return None
+
+        self._remember(key, entry)
+        self.hits += 1
+        return entry
+
+    def _remember(self, key: str, entry: Tuple[np.ndarray, np.ndarray]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries and self.cache_dir is not None:
+            self._memory.popitem(last=False)
+
+    def put(self, key: str, keypoints: np.ndarray, descriptors: np.ndarray) -> None:
+        self._remember(key, (keypoints, descriptors))
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        # Per-process (and thread) temporary file: workers featurizing identical
+        # pixels write the same entry at the same time
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp.npz")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            np.savez(tmp_path, keypoints=keypoints, descriptors=descriptors)
+            os.replace(tmp_path, path)
+        except OSError:
+            # The cache is best-effort: a failed write is only a later miss
+            tmp_path.unlink(missing_ok=True)
+
+
+class FrameStore:
+    """
+    Optional on-disk store of the frames cleaned in one run, shared by later
+    stages and pool workers through memory maps instead of pickled arrays.
+
+    Each writing process appends to its own segment (frames-<pid>.u8) an
+    image's grayscale proxy followed by its full-resolution BGR frame, as raw
+    uint8 rows, then records their offsets and shapes in a sidecar index
+    (frames-<pid>.jsonl) once the bytes are flushed. Readers map each segment
+    read-only and hand out zero-copy views. Entries are keyed by feature key
+    (the content hash of the cleaned pixels), so they do not depend on output
+    names.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._segment = None
+        self._index = None
+        self._entries: Dict[str, Dict] = {}
+        self._index_positions: Dict[Path, int] = {}
+        self._maps: Dict[str, np.memmap] = {}
+
+    def add(self, key: str, frame: np.ndarray, proxy: np.ndarray) -> None:
+        if self._segment is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            name = f"frames-{os.getpid()}"
+            self._segment = open(self.root / f"{name}.u8", 'ab')
+            self._index = open(self.root / f"{name}.jsonl", 'a', encoding='utf-8')
+
+        entry = {"key": key, "segment": Path(self._segment.name).name}
+        for field, pixels in (("proxy", proxy), ("frame", frame)):
+            entry[field] = [self._segment.tell(), *pixels.shape]
+            self._segment.write(np.ascontiguousarray(pixels, dtype=np.uint8).data)
+        self._segment.flush()
+        self._index.write(json.dumps(entry) + "\n")
+        self._index.flush()
+
+    def _read_indexes(self) -> None:
+        """Pick up entries appended since the last call, by any process."""
+        for path in sorted(self.root.glob("frames-*.jsonl")):
+            with open(path, 'r', encoding='utf-8') as f:
+                f.seek(self._index_positions.get(path, 0))
+                for line in iter(f.readline, ''):
+                    if not line.endswith("\n"):
+                        break  # Still being written
+                    entry = json.loads(line)
+                    self._entries[entry["key"]] = entry
+                    self._index_positions[path] = f.tell()
+
+    def _view(self, key: str, field: str) -> Optional[np.ndarray]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._read_indexes()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+        offset, *shape = entry[field]
+        size = int(np.prod(shape))
+        data = self._maps.get(entry["segment"])
+        if data is None or data.shape[0] < offset + size:
+            # Map (again, if the segment has grown since it was mapped)
+            data = self._maps[entry["segment"]] = np.memmap(self.root / entry["segment"],
+                                                            dtype=np.uint8, mode='r')
+        return data[offset:offset + size].reshape(shape)
+
+    def proxy(self, key: str) -> Optional[np.ndarray]:
+        """Read-only grayscale proxy stored under key, or None."""
+        return self._view(key, "proxy")
+
+    def frame(self, key: str) -> Optional[np.ndarray]:
+        """Read-only full-resolution BGR frame stored under key, or None."""
+        return self._view(key, "frame")
+
+    def clear(self) -> None:
+        """Close this process's segment and delete every stored frame."""
+        for handle in (self._segment, self._index):
+            if handle is not None:
+                handle.close()
+        self._segment = self._index = None
+        self._entries, self._index_positions, self._maps = {}, {}, {}
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class MemoryFrameStore(FrameStore):
+    """FrameStore for the in-memory API: frames and proxies stay in process memory."""
+
+    def __init__(self):
+        self._frames: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def add(self, key: str, frame: np.ndarray, proxy: np.ndarray) -> None:
+        self._frames[key] = (frame, proxy)
+
+    def proxy(self, key: str) -> Optional[np.ndarray]:
+        entry = self._frames.get(key)
+        return entry[1] if entry is not None else None
+
+    def frame(self, key: str) -> Optional[np.ndarray]:
+        entry = self._frames.get(key)
+        return entry[0] if entry is not None else None
+
+    def clear(self) -> None:
+        self._frames = {}
+
+
+def is_binary_descriptor(descriptors: np.ndarray) -> bool:
+    """True for ORB-style packed binary descriptors (as opposed to histogram fallbacks)."""
+    return descriptors.ndim == 2 and descriptors.dtype == np.uint8 and descriptors.shape[0] > 0
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Set bits per word; NumPy < 2 has no bitwise_count, so count per byte."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return table[words[..., None].view(np.uint8)].sum(axis=-1, dtype=np.uint8)
+
+
+class HammingMatcher:
+    """
+    Vectorized cross-checked Hamming matching for ORB descriptors.
+
+    Reproduces BFMatcher(NORM_HAMMING, crossCheck=True) scoring for one query
+    against many images at once. Descriptors stay packed as uint64 words
+    (4 per 256-bit ORB descriptor); all distances of a block come from XOR
+    plus popcount, one word at a time over cache-sized tiles. Mutual nearest
+    neighbours closer than good_distance are counted and normalized by the
+    smaller descriptor count. Nearest neighbours are found with min
+    reductions; the first index on ties, which BFMatcher keeps, is only
+    searched for where a tie exists.
+    """
+
+    def __init__(self, good_distance: int = 50, block_size: int = 64, tile_size: int = 4096):
+        self.good_distance = good_distance
+        self.block_size = block_size
+        self.tile_size = tile_size
+
+    @staticmethod
+    def _words(descriptors: np.ndarray) -> np.ndarray:
+        """Descriptors as uint64 words, one row per word position: (words, n)."""
+        padding = -descriptors.shape[1] % 8
+        if padding:
+            descriptors = np.pad(descriptors, ((0, 0), (0, padding)))
+        return np.ascontiguousarray(descriptors).view(np.uint64).T.copy()
+
+    def _distances(self, query_words: np.ndarray, train_words: np.ndarray) -> np.ndarray:
+        """Hamming distances (uint16) between every query and train descriptor."""
+        count = train_words.shape[1]
+        distances = np.empty((query_words.shape[1], count), dtype=np.uint16)
+        for start in range(0, count, self.tile_size):
+            stop = start + self.tile_size
+            tile = distances[:, start:stop]
+            tile[...] = popcount(query_words[0][:, None] ^ train_words[0][None, start:stop])
+            for word in range(1, len(query_words)):
+                tile += popcount(query_words[word][:, None] ^ train_words[word][None, start:stop])
+        return distances
+
+    def similarities(self, query: np.ndarray, others: List[np.ndarray]) -> np.ndarray:
+        """Similarity of query to each of others; non-binary descriptors score 0."""
+        scores = np.zeros(len(others), dtype=np.float64)
+        if not is_binary_descriptor(query):
+            return scores
+
+        query_words = self._words(query)
+        valid_idx = [i for i, desc in enumerate(others)
+                     if is_binary_descriptor(desc) and desc.shape[1] == query.shape[1]]
+
+        for start in range(0, len(valid_idx), self.block_size):
+            block_idx = valid_idx[start:start + self.block_size]
+            counts = np.array([len(others[i]) for i in block_idx])
+            width = counts.max()
+
+            # Pad every image in the block to the same descriptor count
+            block_words = np.zeros((len(query_words), len(block_idx), width), dtype=np.uint64)
+            for b, i in enumerate(block_idx):
+                block_words[:, b, :counts[b]] = self._words(others[i])
+            distances = self._distances(query_words, block_words.reshape(len(query_words), -1))
+            distances = distances.reshape(len(query), len(block_idx), width)
+            distances[:, np.arange(width)[None, :] >= counts[:, None]] = np.iinfo(np.uint16).max
+
+            # Forward (query -> other) nearest neighbours; only those closer than
+            # good_distance can count, so only their index is needed
+            forward = distances.min(axis=2)
+            rows, images = np.nonzero(forward < self.good_distance)
+            best = forward[rows, images]
+            cols = np.argmax(distances[rows, images] == best[:, None], axis=1)
+
+            # Backward (other -> query): the query must be the other's nearest
+            # neighbour, and the first one on ties
+            backward = distances.min(axis=0)
+            mutual = best == backward[images, cols]
+            tied = mutual & (np.count_nonzero(distances == backward, axis=0)[images, cols] > 1)
+            if tied.any():
+                first = np.argmax(distances[:, images[tied], cols[tied]] == best[tied], axis=0)
+                mutual[tied] = first == rows[tied]
+
+            good = np.bincount(images[mutual], minlength=len(block_idx))
+            scores[block_idx] = np.minimum(good / np.minimum(len(query), counts), 1.0)
+
+        return scores
+
+
+class CandidateIndex:
+    """
+    Bag-of-visual-words index over ORB descriptors.
+
+    A small binary vocabulary is learned with k-means over a sample of all
+    descriptors; each screen becomes an L2-normalized tf-idf vector of word
+    counts, and the nearest screens by cosine similarity are proposed as
+    grouping candidates. Screens without binary descriptors are always
+    proposed, since they can only be compared via histograms.
+
+    Descriptors are pulled through load_descriptors one screen at a time, so
+    only the word-count vectors are held in memory.
+    """
+
+    def __init__(self, names: List[str], load_descriptors: Callable[[str], np.ndarray],
+                 vocab_size: int = 128, sample_size: int = 10000):
+        self.names = list(names)
+        self.position = {name: i for i, name in enumerate(self.names)}
+        binary_names = [name for name in self.names if is_binary_descriptor(load_descriptors(name))]
+        binary = set(binary_names)
+        self.always_candidates = [name for name in self.names if name not in binary]
+
+        self.vectors = np.zeros((len(self.names), 1), dtype=np.float32)
+        if not binary_names:
+            return
+
+        # Deterministic descriptor sample for the vocabulary, drawn evenly per screen
+        rng = np.random.default_rng(0)
+        per_screen = max(1, sample_size // len(binary_names))
+        samples = []
+        for name in binary_names:
+            desc = load_descriptors(name)
+            if len(desc) > per_screen:
+                desc = desc[rng.choice(len(desc), per_screen, replace=False)]
+            samples.append(desc)
+        stacked = np.vstack(samples)
+
+        vocab_size = max(1, min(vocab_size, len(stacked)))
+        bits = np.unpackbits(stacked, axis=1).astype(np.float32)
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
+        cv2.setRNGSeed(0)
+        _, _, centers = cv2.kmeans(bits, vocab_size, None, criteria, 1, cv2.KMEANS_PP_CENTERS)
+        self.vocabulary_bits = (centers > 0.5).astype(np.float32)
+
+        counts = np.zeros((len(self.names), vocab_size), dtype=np.float32)
+        for name in binary_names:
+            words = self.assign_words(load_descriptors(name))
+            counts[self.position[name]] = np.bincount(words, minlength=vocab_size)
+
+        # tf-idf weighting down-weights words shared by every screen (e.g. tab bars)
+        document_freq = np.count_nonzero(counts, axis=0)
+        idf = np.log((len(binary_names) + 1) / (document_freq + 1)) + 1.0
+        vectors = counts * idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.vectors = vectors / np.maximum(norms, 1e-12)
+
+    def assign_words(self, descriptors: np.ndarray) -> np.ndarray:
+        """Index of the nearest vocabulary word (Hamming distance) for each descriptor."""
+        # |a xor b| = |a| + |b| - 2 a.b on unpacked bits, so one matrix product does all pairs
+        bits = np.unpackbits(descriptors, axis=1).astype(np.float32)
+        distances = (bits.sum(axis=1, keepdims=True) + self.vocabulary_bits.sum(axis=1)
+                     - 2.0 * bits @ self.vocabulary_bits.T)
+        return np.argmin(distances, axis=1)
+
+    def candidates(self, name: str, k: int) -> Set[str]:
+        """The k most similar screens to name, plus screens without binary descriptors."""
+        proposed = set(self.always_candidates)
+        if name in proposed:
+            # No signature for this screen: it must be compared with everything
+            return set(self.names)
+
+        scores = self.vectors @ self.vectors[self.position[name]]
+        scores[self.position[name]] = -np.inf
+        k = min(k, len(self.names) - 1)
+        if k > 0:
+            nearest = np.argpartition(-scores, k - 1)[:k]
+            proposed.update(self.names[i] for i in nearest)
+        proposed.discard(name)
+        return proposed
+
+
+class NearDuplicateIndex:
+    """
+    Near-exact repeats among a run's screenshots, found before they are cleaned.
+
+    Signatures cover the content above the status band, so captures that only
+    differ in clock, battery or signal icons still match. A 64-bit difference
+    hash proposes candidates; a fixed-size grayscale thumbnail must then
+    agree within max_diff grey levels everywhere, so a changed word or field
+    value keeps two screens apart. The first screen of a set is its
+    representative and later ones collapse onto it.
+    """
+
+    def __init__(self, hash_distance: int = 10, max_diff: int = 12):
+        self.hash_distance = hash_distance
+        self.max_diff = max_diff
+        self.representatives: List[Tuple[str, np.ndarray]] = []
+        # Difference hashes of the representatives, in order (grown by doubling)
+        self._digests = np.zeros(64, dtype=np.uint64)
+        # Collapsed source name -> representative source name, in input order
+        self.collapsed: Dict[str, str] = {}
+
+    @staticmethod
+    def signature(content: np.ndarray, thumbnail_size: Tuple[int, int] = (64, 120)) -> Tuple[int, np.ndarray]:
+        """(difference hash, grayscale thumbnail) of a BGR or grayscale content area."""
+        gray = content if content.ndim == 2 else cv2.cvtColor(content, cv2.COLOR_BGR2GRAY)
+        thumbnail = cv2.resize(gray, thumbnail_size, interpolation=cv2.INTER_AREA)
+        cells = cv2.resize(thumbnail, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = np.packbits(cells[:, 1:] > cells[:, :-1])
+        return int.from_bytes(bits.tobytes(), "big"), thumbnail
+
+    def match(self, name: str, signature: Tuple[int, np.ndarray]) -> Optional[str]:
+        """Representative that name repeats, or None after making name a representative."""
+        digest, thumbnail = signature
+        count = len(self.representatives)
+        distances = popcount(self._digests[:count] ^ np.uint64(digest))
+        for index in np.flatnonzero(distances <= self.hash_distance):
+            representative, rep_thumbnail = self.representatives[index]
+            if (rep_thumbnail.shape == thumbnail.shape
+                    and int(cv2.absdiff(rep_thumbnail, thumbnail).max()) <= self.max_diff):
+                self.collapsed[name] = representative
+                return representative
+
+        if count == len(self._digests):
+            self._digests = np.concatenate([self._digests, np.zeros_like(self._digests)])
+        self._digests[count] = digest
+        self.representatives.append((name, thumbnail))
+        return None
+
+
+class DeviceProfileStore:
+    """
+    Status-bar geometry learned per device fingerprint (frame resolution).
+
+    Every full detection votes for a band start (votes within `tolerance`
+    pixels are merged). A profile becomes trusted once its leading start has
+    at least `confirmations` votes and `min_agreement` of all votes; until then
+    every image still runs full detection. Profiles are persisted as JSON and
+    reused across runs.
+
+    Votes are only cast during calibration in the parent process, so the
+    profile set is fixed before any image is cleaned, whatever the worker count.
+    Without a path, profiles last for this store only.
+    """
+
+    def __init__(self, path: Optional[Path], confirmations: int = 3, tolerance: int = 4,
+                 min_agreement: float = 0.6):
+        self.path = Path(path) if path is not None else None
+        self.confirmations = confirmations
+        self.tolerance = tolerance
+        self.min_agreement = min_agreement
+        self.profiles: Dict[str, Dict] = {}
+        if self.path is not None and self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.profiles = json.load(f)
+            except Exception:
+                self.profiles = {}
+
+    @staticmethod
+    def fingerprint(image: np.ndarray) -> str:
+        height, width = image.shape[:2]
+        return f"{width}x{height}"
+
+    def _leading_vote(self, profile: Dict) -> Tuple[int, int, int]:
+        """(start, votes, total votes) of the most voted band start."""
+        votes = profile["votes"]
+        start = max(votes, key=lambda k: (votes[k], -int(k)))
+        return int(start), votes[start], sum(votes.values())
+
+    def lookup(self, image: np.ndarray) -> Optional[Tuple[int, int]]:
+        """Trusted (start_y, end_y) for this image's device, if any."""
+        return self.lookup_profile(self.profiles.get(self.fingerprint(image)))
+
+    def lookup_profile(self, profile: Optional[Dict]) -> Optional[Tuple[int, int]]:
+        if not profile or not profile["votes"]:
+            return None
+
+        start, votes, total = self._leading_vote(profile)
+        if votes >= self.confirmations and votes / total >= self.min_agreement:
+            return start, profile["status_end"]
+        return None
+
+    def observe(self, image: np.ndarray, region: Tuple[int, int], sample: Optional[str] = None) -> None:
+        """
+        Record a full detection as a vote for its band start. A sample id (e.g.
+        the source's hash) makes repeated calibration on the same image, as
+        shards do, vote only once.
+        """
+        key = self.fingerprint(image)
+        profile = self.profiles.setdefault(key, {"status_end": region[1], "votes": {}})
+        if sample is not None:
+            if sample in profile.setdefault("samples", []):
+                return
+            profile["samples"].append(sample)
+        votes = profile["votes"]
+
+        match = next((k for k in votes if abs(int(k) - region[0]) <= self.tolerance), None)
+        match = match if match is not None else str(region[0])
+        votes[match] = votes.get(match, 0) + 1
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Per-process temporary file: concurrent shards may save at the same time
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.profiles, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class BackupStore:
+    """
+    Content-addressed store of original screenshots.
+
+    Each distinct file is kept once under objects/<sha1[:2]>/<sha1><ext>,
+    cloned (reflink) or, failing that, copied from the source. Objects never
+    share an inode with a live file (a hard link would follow the source when
+    it is overwritten in place), and their hash is checked again on restore.
+    index.json maps each original's filename to its object together with the
+    size and mtime it was stored with, so unchanged files are recognised from
+    a stat() alone and cost no backup I/O on later runs. Outputs this pipeline
+    commits are recorded separately: reprocessing one later never replaces the
+    original backed up under the same name.
+    """
+
+    INDEX_VERSION = 1
+    # Linux FICLONE ioctl: copy-on-write clone on btrfs/XFS and similar
+    FICLONE = 0x40049409
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.root / "index.json"
+        self.files: Dict[str, Dict] = {}
+        self.outputs: Dict[str, Dict] = {}
+        self.stored = 0
+        self._lock = threading.Lock()
+        if self.index_path.exists():
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                if index.get("version") == self.INDEX_VERSION:
+                    self.files = index.get("files", {})
+                    self.outputs = index.get("outputs", {})
+            except Exception:
+                pass
+        self._import_flat_backups()
+
+    def _import_flat_backups(self) -> None:
+        """Move plain copies left by older versions into the store."""
+        for path in sorted(self.root.iterdir()):
+            if path.is_file() and path.suffix.lower() in {'.jpg', '.jpeg', '.png', '.bmp'}:
+                if path.name not in self.files:
+                    self.put(path)
+                path.unlink()
+
+    @staticmethod
+    def _stamp(path: Path) -> Dict:
+        stat = path.stat()
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def _clone(self, source: Path, target: Path) -> None:
+        """Reflink source to target, else copy it."""
+        tmp_path = target.with_name(target.name + ".tmp")
+        tmp_path.unlink(missing_ok=True)
+        try:
+            import fcntl
+            with open(source, 'rb') as src, open(tmp_path, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), self.FICLONE, src.fileno())
+            shutil.copystat(source, tmp_path)
+        except (ImportError, OSError):
+            tmp_path.unlink(missing_ok=True)
+            shutil.copy2(source, tmp_path)
+        os.replace(tmp_path, target)
+
+    def _hash(self, path: Path) -> str:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _object(self, entry: Dict) -> Path:
+        return self.objects_dir / entry["object"]
+
+    def put(self, path: Path) -> Path:
+        """
+        Back up path if its content is not stored yet and return the stored
+        object, which stays readable whatever later happens to path.
+        """
+        stamp = self._stamp(path)
+        with self._lock:
+            for table in (self.files, self.outputs):
+                entry = table.get(path.name)
+                if entry and entry["size"] == stamp["size"] and entry["mtime_ns"] == stamp["mtime_ns"]:
+                    if self._object(entry).exists():
+                        return self._object(entry)
+
+        digest = self._hash(path)
+        entry = {"hash": digest, "object": f"{digest[:2]}/{digest}{path.suffix.lower()}", **stamp}
+        target = self._object(entry)
+        # Objects hard-linked by older versions are replaced by a private copy
+        if not target.exists() or target.stat().st_nlink > 1:
+            target.parent.mkdir(exist_ok=True)
+            self._clone(path, target)
+            self.stored += 1
+
+        with self._lock:
+            output = self.outputs.get(path.name)
+            if output is not None and output["hash"] == digest:
+                self.outputs[path.name] = entry
+            else:
+                self.files[path.name] = entry
+        return target
+
+    def mark_output(self, path: Path, digest: str) -> None:
+        """Record a file the pipeline wrote, so it is not mistaken for an original."""
+        entry = {"hash": digest, "object": f"{digest[:2]}/{digest}{path.suffix.lower()}",
+                 **self._stamp(path)}
+        with self._lock:
+            self.outputs[path.name] = entry
+
+    def restore(self, target_dir: Path, names: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Copy originals back into target_dir under their original names (all of
+        them by default). Objects whose content no longer matches their hash
+        are skipped rather than restored.
+        """
+        restored = []
+        for name in sorted(self.files if names is None else names):
+            entry = self.files.get(name)
+            if entry is None or not self._object(entry).exists():
+                continue
+            if self._hash(self._object(entry)) != entry["hash"]:
+                continue
+            self._clone(self._object(entry), Path(target_dir) / name)
+            restored.append(name)
+        return restored
+
+    def save(self) -> None:
+        """Drop objects no original refers to (e.g. reprocessed outputs) and write the index."""
+        with self._lock:
+            referenced = {entry["object"] for entry in self.files.values()}
+            for path in self.objects_dir.glob("*/*"):
+                if f"{path.parent.name}/{path.name}" not in referenced:
+                    path.unlink()
+            tmp_path = self.index_path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": self.INDEX_VERSION, "files": self.files, "outputs": self.outputs},
+                          f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+
+
+class ImageRecord:
+    """
+    Compact per-image record used by grouping and scrollable classification.
+
+    Holds no pixels: descriptors are fetched from the FeatureCache by
+    feature_key, and the only content statistic classification needs
+    (bottom-region standard deviation) is precomputed, as is what the client
+    needs to lay a screen out before downloading it (dominant colour and a
+    tiny placeholder; content_hash is the SHA-1 of the written output).
+    """
+
+    def __init__(self, filename: str, feature_key: str, bottom_std: float, shape: Tuple[int, ...],
+                 variants: Optional[List[str]] = None, dominant_color: str = "", placeholder: str = "",
+                 content_hash: str = ""):
+        self.filename = filename
+        self.feature_key = feature_key
+        self.bottom_std = bottom_std
+        self.shape = tuple(shape)
+        # Responsive variant files (in the responsive/ subdirectory) written for this output
+        self.variants: List[str] = list(variants or [])
+        self.dominant_color = dominant_color
+        self.placeholder = placeholder
+        self.content_hash = content_hash
+        # Status-bar cleaning tier/cost/quality and stage timings, carried back from pool workers
+        self.inpaint_report: Optional[Dict] = None
+        self.stage_metrics: List[Dict] = []
+        # NearDuplicateIndex signature of the source, and for a collapsed repeat
+        # the output filename of the representative whose output it reuses
+        self.signature: Optional[Tuple[int, np.ndarray]] = None
+        self.duplicate_of: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return {"feature_key": self.feature_key, "bottom_std": self.bottom_std, "shape": list(self.shape),
+                "variants": self.variants, "dominant_color": self.dominant_color,
+                "placeholder": self.placeholder}
+
+    @classmethod
+    def from_dict(cls, filename: str, data: Dict) -> "ImageRecord":
+        # content_hash is the manifest entry's output_hash
+        return cls(filename, data["feature_key"], data["bottom_std"], data["shape"], data.get("variants"),
+                   data.get("dominant_color", ""), data.get("placeholder", ""), data.get("output_hash", ""))
+
+
+class StageMetrics:
+    """
+    Wall time, CPU time and peak memory per pipeline stage and per image.
+
+    stage() is a no-op unless enabled. Peak memory is the traced allocation
+    peak above the stage's starting point (tracemalloc sees NumPy buffers,
+    including frames returned by OpenCV); a nested stage reports its own peak
+    and still counts towards the enclosing one. CPU time is process-wide, so
+    it includes OpenCV's internal threads.
+    """
+
+    STAGES = ("load", "dedup", "detect", "mask", "inpaint", "encode", "featurize", "group", "classify", "stitch")
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.samples: List[Dict] = []
+        self.current_image: Optional[str] = None
+        self._open: List[Dict] = []
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def image(self, name: str):
+        """Attribute stages run inside this block to image name."""
+        previous, self.current_image = self.current_image, name
+        try:
+            yield
+        finally:
+            self.current_image = previous
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        current, peak = tracemalloc.get_traced_memory()
+        if self._open:
+            # Fold the enclosing stage's peak so far in before resetting the counter
+            self._open[-1]["peak"] = max(self._open[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+        frame = {"start": current, "peak": current}
+        self._open.append(frame)
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            self._open.pop()
+            peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            if self._open:
+                self._open[-1]["peak"] = max(self._open[-1]["peak"], peak)
+            self.samples.append({"stage": name, "image": self.current_image,
+                                 "wall_ms": round(wall * 1000, 3), "cpu_ms": round(cpu * 1000, 3),
+                                 "peak_kb": round((peak - frame["start"]) / 1024, 1)})
+
+    def record(self, name: str, image: Optional[str], wall: float, cpu: float) -> None:
+        """Add a sample timed elsewhere, e.g. on an I/O thread (no memory figure)."""
+        if self.enabled:
+            self.samples.append({"stage": name, "image": image, "wall_ms": round(wall * 1000, 3),
+                                 "cpu_ms": round(cpu * 1000, 3), "peak_kb": None})
+
+    def drain(self) -> List[Dict]:
+        """Hand over and forget the samples collected so far (used by pool workers)."""
+        samples, self.samples = self.samples, []
+        return samples
+
+    def merge(self, samples: List[Dict]) -> None:
+        self.samples.extend(samples)
+
+    def summary(self) -> Dict:
+        """Per-stage totals and per-image stage timings."""
+        stages: Dict[str, Dict] = {}
+        images: Dict[str, Dict[str, float]] = {}
+        for sample in self.samples:
+            totals = stages.setdefault(sample["stage"], {"calls": 0, "wall_ms": 0.0, "cpu_ms": 0.0,
+                                                         "peak_kb": 0.0})
+            totals["calls"] += 1
+            totals["wall_ms"] += sample["wall_ms"]
+            totals["cpu_ms"] += sample["cpu_ms"]
+            if sample["peak_kb"] is not None:
+                totals["peak_kb"] = max(totals["peak_kb"], sample["peak_kb"])
+            if sample["image"] is not None:
+                timings = images.setdefault(sample["image"], {})
+                timings[sample["stage"]] = round(timings.get(sample["stage"], 0.0) + sample["wall_ms"], 3)
+
+        ordered = {name: stages[name] for name in self.STAGES if name in stages}
+        ordered.update({name: totals for name, totals in stages.items() if name not in ordered})
+        for totals in ordered.values():
+            totals["wall_ms"] = round(totals["wall_ms"], 3)
+            totals["cpu_ms"] = round(totals["cpu_ms"], 3)
+            totals["mean_wall_ms"] = round(totals["wall_ms"] / totals["calls"], 3)
+
+        # ru_maxrss is in kilobytes on Linux; pool workers are reported as children.
+        # resource is Unix-only: elsewhere peak RSS is not reported
+        max_rss_kb = max_child_rss_kb = None
+        try:
+            import resource
+            max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            max_child_rss_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        except ImportError:
+            pass
+        return {"stages": ordered, "images": images,
+                "max_rss_kb": max_rss_kb, "max_child_rss_kb": max_child_rss_kb}
+
+    def save(self, json_path: Path) -> Dict:
+        """Write the summary to json_path and every sample to a .csv next to it."""
+        summary = self.summary()
+        json_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        with open(json_path.with_suffix(".csv"), 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=["image", "stage", "wall_ms", "cpu_ms", "peak_kb"])
+            writer.writeheader()
+            writer.writerows(self.samples)
+        return summary
+
+
+class PipelinedIO:
+    """
+    Overlaps disk work with the cleaning loop on threads (OpenCV's codecs and
+    file I/O release the GIL).
+
+    backup_all() stores sources in the BackupStore in input order. prefetch()
+    reads, hashes and decodes or signs sources ahead of the consumer, with at
+    most max_frames in flight. write() encodes outputs behind it into a staging
+    directory; commit() moves each into place once its source is backed up.
+    """
+
+    def __init__(self, backup: BackupStore, staging_dir: Path, io_threads: int = 2, max_frames: int = 4,
+                 metrics: Optional[StageMetrics] = None):
+        self.backup = backup
+        self.staging_dir = Path(staging_dir)
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        self.max_frames = max(1, max_frames)
+        self.metrics = metrics or StageMetrics()
+        from concurrent.futures import ThreadPoolExecutor
+        self._copier = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup")
+        self._readers = ThreadPoolExecutor(max_workers=max(1, io_threads), thread_name_prefix="prefetch")
+        self._writers = ThreadPoolExecutor(max_workers=max(1, io_threads), thread_name_prefix="writer")
+        self._backups: Dict[str, Future] = {}
+        self._pending_writes: deque = deque()
+
+    def backup_all(self, files: Iterable[Path]) -> None:
+        for path in files:
+            self._backups[path.name] = self._copier.submit(self.backup.put, path)
+
+    def _read(self, path: Path, decode: bool,
+              signature: Optional[Callable[[bytes], Optional[Tuple[int, np.ndarray]]]] = None
+              ) -> Tuple[Path, Optional[np.ndarray], str, Optional[Tuple[int, np.ndarray]]]:
+        wall, cpu = time.perf_counter(), time.thread_time()
+        if path.name in self._backups:
+            path = self._backups[path.name].result()
+        data = path.read_bytes()
+
+        image = None
+        if decode:
+            try:
+                image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            except Exception:
+                image = None
+            self.metrics.record("load", path.name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+        content_signature = None
+        if signature is not None:
+            wall, cpu = time.perf_counter(), time.thread_time()
+            content_signature = signature(data)
+            self.metrics.record("dedup", path.name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+        return path, image, hashlib.sha1(data).hexdigest(), content_signature
+
+    def source_hash(self, path: Path) -> Future:
+        """Hash of a source's bytes, read on an I/O thread; the future yields the hex digest."""
+        return self._readers.submit(lambda: self._read(path, False)[2])
+
+    def prefetch(self, files: Iterable[Path], decode: bool = True,
+                 signature: Optional[Callable[[bytes], Optional[Tuple[int, np.ndarray]]]] = None
+                 ) -> Iterator[Tuple[Path, Optional[np.ndarray], str, Optional[Tuple[int, np.ndarray]]]]:
+        """
+        Yield (path, image or None, source hash, signature or None) for each file
+        in order; signature, if given, maps a source's bytes to its signature.
+        """
+        files = iter(files)
+        window = deque((path, self._readers.submit(self._read, path, decode, signature))
+                       for path in itertools.islice(files, self.max_frames))
+        while window:
+            path, future = window.popleft()
+            _, image, digest, content_signature = future.result()
+            upcoming = next(files, None)
+            if upcoming is not None:
+                window.append((upcoming, self._readers.submit(self._read, upcoming, decode, signature)))
+            yield path, image, digest, content_signature
+
+    def _write(self, path: Path, image: Optional[np.ndarray], data: Optional[bytes],
+               label: Optional[str]) -> str:
+        if image is not None:
+            wall, cpu = time.perf_counter(), time.thread_time()
+            ok, buffer = cv2.imencode(path.suffix, image)
+            data = buffer.tobytes() if ok else b''
+            self.metrics.record("encode", label, time.perf_counter() - wall, time.thread_time() - cpu)
+
+        (self.staging_dir / path.name).write_bytes(data)
+        pending_backup = self._backups.get(path.name)
+        if pending_backup is not None:
+            pending_backup.result()
+        return hashlib.sha1(data).hexdigest()
+
+    def write(self, path: Path, image: Optional[np.ndarray] = None, data: Optional[bytes] = None,
+              label: Optional[str] = None) -> Future:
+        """
+        Write already encoded data, or encode image by path's extension, in the
+        background. The future yields the SHA-1 of the written bytes; the file
+        reaches path only through commit().
+        """
+        while len(self._pending_writes) >= self.max_frames:
+            self._pending_writes.popleft().result()
+        future = self._writers.submit(self._write, path, image, data, label)
+        self._pending_writes.append(future)
+        return future
+
+    def _write_files(self, produce: Callable[[], Dict[Path, bytes]], label: Optional[str]) -> List[str]:
+        wall, cpu = time.perf_counter(), time.thread_time()
+        files = produce()
+        self.metrics.record("encode", label, time.perf_counter() - wall, time.thread_time() - cpu)
+        for path, data in files.items():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+        return [path.name for path in files]
+
+    def write_files(self, produce: Callable[[], Dict[Path, bytes]], label: Optional[str] = None) -> Future:
+        """
+        Encode and write auxiliary files (e.g. responsive variants) in the
+        background, bounded like write(). produce() runs on the writer thread and
+        returns path -> bytes; the future yields the written file names. These
+        files are not staged.
+        """
+        while len(self._pending_writes) >= self.max_frames:
+            self._pending_writes.popleft().result()
+        future = self._writers.submit(self._write_files, produce, label)
+        self._pending_writes.append(future)
+        return future
+
+    def commit(self, path: Path, future: Future) -> str:
+        """Wait for a write and move the staged file to path; returns its SHA-1."""
+        digest = future.result()
+        os.replace(self.staging_dir / path.name, path)
+        self.backup.mark_output(path, digest)
+        return digest
+
+    def flush(self) -> None:
+        """Wait for every pending write, re-raising the first failure."""
+        while self._pending_writes:
+            self._pending_writes.popleft().result()
+
+    def close(self) -> None:
+        """Finish pending writes and backups, stop the I/O threads and save the backup index."""
+        try:
+            self.flush()
+            for future in self._backups.values():
+                future.result()
+        finally:
+            self._readers.shutdown(cancel_futures=True)
+            self._writers.shutdown()
+            self._copier.shutdown(cancel_futures=True)
+            self.backup.save()
+
+
+# Bump when a change to the pipeline should invalidate existing manifests
+MANIFEST_VERSION = 6
+
+# Near-duplicate signatures are taken on a grayscale frame at 1/SIGNATURE_SCALE,
+# the reduction cv2.IMREAD_REDUCED_GRAYSCALE_4 decodes to, and cover its top
+# SIGNATURE_CONTENT: detect_status_bar_region never starts a band higher, so
+# the signed area leaves every status band out without detecting it per frame
+SIGNATURE_SCALE = 4
+SIGNATURE_CONTENT = 0.85
+
+# Responsive output formats: MIME type and cv2.imencode parameters (OpenCV flag
+# names, resolved when encoding so that importing this module does not load OpenCV)
+VARIANT_FORMATS = {
+    "avif": ("image/avif", [("IMWRITE_AVIF_QUALITY", 60)]),
+    "webp": ("image/webp", [("IMWRITE_WEBP_QUALITY", 80)]),
+    "jpg": ("image/jpeg", [("IMWRITE_JPEG_QUALITY", 82), ("IMWRITE_JPEG_PROGRESSIVE", 1),
+                           ("IMWRITE_JPEG_OPTIMIZE", 1)]),
+}
+
+
+def variant_encode_params(fmt: str) -> List[int]:
+    """cv2.imencode parameters for a VARIANT_FORMATS format (flags this OpenCV lacks are left out)."""
+    return [value for flag, setting in VARIANT_FORMATS[fmt][1] if hasattr(cv2, flag)
+            for value in (getattr(cv2, flag), setting)]
+
+
+_WORKER_PROCESSOR = None
+
+
+def _init_worker(settings: Dict, log_queue=None, log_level: int = logging.INFO) -> None:
+    """Pool initializer: build one processor per worker process."""
+    global _WORKER_PROCESSOR
+    # One OpenCV thread per process, the pool provides the parallelism
+    cv2.setNumThreads(1)
+    if log_queue is not None:
+        # Ship log records to the parent's listener instead of writing them here
+        root = logging.getLogger()
+        root.handlers = [QueueHandler(log_queue)]
+        root.setLevel(log_level)
+    _WORKER_PROCESSOR = EnhancedImageProcessor(**settings)
+
+
+def _clean_image_worker(img_path: str, sign: bool = True) -> Tuple[str, Optional["ImageRecord"], Optional[bytes],
+                                                                   Dict[str, bytes], bool]:
+    """
+    Pool task: decode, clean, featurize and encode one screenshot.
+    Returns (source name, image record, encoded bytes, encoded variants, success flag).
+    """
+    return _WORKER_PROCESSOR.clean_image_file(Path(img_path), sign)
+
 
 class EnhancedImageProcessor:
-    def __init__(self, screens_dir: str = "src/assets/screens", batch_size: int = 15):
+    def __init__(self, screens_dir: str = "src/assets/screens", batch_size: int = 15,
+                 cache_dir: Optional[str] = None, workers: int = 1, incremental: bool = True,
+                 candidate_k: int = 16, recall_report: bool = False,
+                 profile_confirmations: int = 3, inpaint_strategy: str = "auto",
+                 uniform_threshold: float = 6.0, metrics: bool = False, proxy_width: int = 360,
+                 validate_proxies: bool = False, io_threads: int = 2, prefetch: int = 4,
+                 variant_widths: Tuple[int, ...] = (360, 720),
+                 variant_formats: Tuple[str, ...] = ("avif", "webp", "jpg"),
+                 stitch: bool = True, stitch_tile_height: int = 4096, frame_store: bool = False,
+                 dedup: bool = True, in_memory: bool = False):
         self.screens_dir = Path(screens_dir)
         self.backup_dir = self.screens_dir / "backup"
         self.batch_size = batch_size
+        # Neighbours proposed per screen by the grouping index (0 = exhaustive matching)
+        self.candidate_k = candidate_k
+        self.recall_report = recall_report
+        # Grouping and classification run on grayscale pyramid proxies at least
+        # proxy_width wide (0 = full resolution); inpainting and output stay full size
+        self.proxy_width = max(0, proxy_width)
+        self.validate_proxies = validate_proxies
+        # Status-bar cleaning tier: "auto" (flat fill on uniform backgrounds, else
+        # TELEA), or force "flat", "ns" or "telea"
+        self.inpaint_strategy = inpaint_strategy
+        self.uniform_threshold = uniform_threshold
+        self.last_inpaint_report: Optional[Dict] = None
+        self.inpaint_reports: Dict[str, Dict] = {}
+        self.workers = max(1, workers)
+        # I/O threads for backup/decode/encode/write, and decoded frames (and
+        # pending writes) allowed ahead of the cleaning loop
+        self.io_threads = max(1, io_threads)
+        self.prefetch = max(1, prefetch)
+        self.cache_dir = cache_dir
+        self.incremental = incremental
+        self.manifest_path = self.screens_dir / ".cache" / "manifest.json"
+        self._file_hashes: Dict[Path, Tuple[int, int, str]] = {}
         self.processed_data = []
-
-        # Setup logging
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(self.screens_dir / "processing.log"),
-                logging.StreamHandler()
-            ]
-        )
+        # Responsive outputs: each cleaned screen is also encoded at these widths
+        # (plus its own width) in every format, under responsive/
+        self.responsive_dir = self.screens_dir / "responsive"
+        self.variant_widths = tuple(sorted(set(variant_widths)))
+        self.variant_formats = tuple(variant_formats)
+        # Scrollable groups are stitched into one deduplicated long image under
+        # stitched/, split into tiles of at most stitch_tile_height rows
+        self.stitch = stitch
+        self.stitched_dir = self.screens_dir / "stitched"
+        self.stitch_tile_height = max(256, stitch_tile_height)
+        # Cleaned frames and proxies of the current run, memory-mapped for
+        # stitching and descriptor reloads instead of decoding outputs again
+        self.frame_store = FrameStore(self.screens_dir / ".cache" / "frames") if frame_store else None
+        # The in-memory API (process_in_memory) keeps frames, features, device
+        # profiles and generated files in memory_files instead of on disk
+        self.in_memory = in_memory
+        self.memory_files: Optional[Dict[str, bytes]] = {} if in_memory else None
+        if in_memory:
+            self.frame_store = MemoryFrameStore()
+        # Near-exact repeats (same content, different status bar) are cleaned
+        # once and reuse their representative's output and features
+        self.dedup = dedup
+        # Image files each run started from and the outputs it wrote, so watch()
+        # tells files that arrived mid-run from the run's own
+        self.run_snapshot: Dict[str, Tuple[int, int]] = {}
+        self.run_outputs: Set[str] = set()
+
+        # Logging is left to the application (see configure_logging for the CLI's)
         self.logger = logging.getLogger(__name__)
 
-        # Create backup directory
-        self.backup_dir.mkdir(exist_ok=True)
+        # Per-stage wall/CPU time and peak memory (off unless requested)
+        self.metrics = StageMetrics(enabled=metrics)
+        # Variant formats OpenCV can encode here, checked when first needed
+        self._variant_writers: Optional[Tuple[str, ...]] = None
+
+        # Feature detector, created on first use so quick runs never load OpenCV
+        self.orb_params = {"nfeatures": 500}
+        self.orb = None
+        self.matcher = HammingMatcher()
+
+        # Pairwise similarities keyed by sorted feature-cache keys, shared by
+        # grouping and scrollable classification
+        self.pair_similarities: Dict[Tuple[str, str], float] = {}
 
-        # Initialize feature detector
-        self.orb = cv2.ORB_create(nfeatures=500)
-        self.bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+        # Persistent descriptor cache shared by grouping and scrollable analysis
+        cache_path = Path(cache_dir) if cache_dir else self.screens_dir / ".cache" / "features"
+        self.feature_cache = FeatureCache(None if in_memory else cache_path,
+                                          {**self.orb_params, "proxy": self.proxy_width})
+
+        # Per-device status-bar geometry (0 confirmations = always run full detection)
+        profiles_path = None if in_memory else self.screens_dir / ".cache" / "device_profiles.json"
+        self.device_profiles = (DeviceProfileStore(profiles_path, confirmations=profile_confirmations)
+                                if profile_confirmations > 0 else None)
 
     def normalize_filename(self, filename: str) -> str:
         """
@@ -83,29 +1211,36 @@ class EnhancedImageProcessor:
         """
         Detect status bar region using edge detection and text analysis.
         Returns (start_y, end_y) of status bar area.
+
+        Only the bottom 20% of the frame (plus one context row for the Sobel
+        kernel) is converted and filtered; the edge threshold is taken over that ROI.
         """
         height, width = image.shape[:2]
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        roi_start = int(height * 0.8)
+        context_start = max(0, roi_start - 1)
+        gray = cv2.cvtColor(image[context_start:], cv2.COLOR_BGR2GRAY)
 
         # Look for high-contrast horizontal bands (typical status bar)
         # Status bars usually have distinct color changes
         sobel_y = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-        sobel_y = cv2.convertScaleAbs(sobel_y)
+        sobel_y = cv2.convertScaleAbs(sobel_y)[roi_start - context_start:]
 
         # Find regions with high vertical gradients (status bar borders)
         threshold = np.mean(sobel_y) + np.std(sobel_y)
-        edges = (sobel_y > threshold).astype(np.uint8) * 255
-
-        # Look at bottom 20% for status bar
-        bottom_region = edges[int(height * 0.8):, :]
-        horizontal_projection = np.sum(bottom_region, axis=1)
+        horizontal_projection = np.count_nonzero(sobel_y > threshold, axis=1).astype(np.int64) * 255
 
-        # Find peaks in horizontal projection (status bar boundaries)
+        # Find peaks in horizontal projection (status bar boundaries): rows that are
+        # 1.5x the mean of the 5 rows before and of the 5 rows after
         peaks = []
-        for i in range(10, len(horizontal_projection) - 10):
-            if (horizontal_projection[i] > horizontal_projection[i-5:i].mean() * 1.5 and
-                horizontal_projection[i] > horizontal_projection[i+1:i+6].mean() * 1.5):
-                peaks.append(i + int(height * 0.8))
+        n = len(horizontal_projection)
+        if n > 20:
+            cumulative = np.concatenate(([0], np.cumsum(horizontal_projection)))
+            rows = np.arange(10, n - 10)
+            before = (cumulative[rows] - cumulative[rows - 5]) / 5
+            after = (cumulative[rows + 6] - cumulative[rows + 1]) / 5
+            current = horizontal_projection[rows]
+            is_peak = (current > before * 1.5) & (current > after * 1.5)
+            peaks = (rows[is_peak] + roi_start).tolist()
 
         if len(peaks) >= 2:
             # Assume status bar is the last significant region
@@ -118,6 +1253,79 @@ class EnhancedImageProcessor:
 
         return status_start, status_end
 
+    def status_bar_region(self, image: np.ndarray) -> Tuple[int, int]:
+        """
+        Status bar region from the trusted device profile for this resolution,
+        falling back to full detection.
+        """
+        if self.device_profiles is not None:
+            region = self.device_profiles.lookup(image)
+            if region is not None:
+                return region
+
+        return self.detect_status_bar_region(image)
+
+    def calibrate_device_profiles(self, image_files: List[Path]) -> None:
+        """
+        Train device profiles on the first images in input order before any
+        cleaning starts, then persist them for pool workers and later runs.
+        """
+        if self.device_profiles is None or not image_files:
+            return
+
+        self.train_device_profiles((self.file_hash(img_file), cv2.imread(str(img_file)))
+                                   for img_file in image_files[:self.device_profiles.confirmations * 2])
+        self.device_profiles.save()
+
+    def train_device_profiles(self, samples: Iterable[Tuple[str, Optional[np.ndarray]]]) -> None:
+        """Vote with full detections on (sample id, decoded image) pairs whose device is not trusted yet."""
+        for sample, image in samples:
+            if image is None or self.device_profiles.lookup(image) is not None:
+                continue
+            self.device_profiles.observe(image, self.detect_status_bar_region(image), sample)
+
+        trusted = sum(1 for profile in self.device_profiles.profiles.values()
+                      if self.device_profiles.lookup_profile(profile) is not None)
+        self.logger.info(f"📐 Device profiles: {trusted} trusted of {len(self.device_profiles.profiles)}")
+
+    @staticmethod
+    def reduce_for_signature(gray: np.ndarray) -> np.ndarray:
+        """A grayscale frame area-reduced to 1/SIGNATURE_SCALE."""
+        height, width = gray.shape
+        return cv2.resize(gray, (max(1, width // SIGNATURE_SCALE), max(1, height // SIGNATURE_SCALE)),
+                          interpolation=cv2.INTER_AREA)
+
+    @staticmethod
+    def reduced_signature(reduced: np.ndarray) -> Tuple[int, np.ndarray]:
+        """NearDuplicateIndex signature of a grayscale frame at 1/SIGNATURE_SCALE."""
+        return NearDuplicateIndex.signature(reduced[:max(1, int(reduced.shape[0] * SIGNATURE_CONTENT))])
+
+    def source_signature(self, data: bytes) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        Near-duplicate signature of an encoded screenshot, from a reduced
+        grayscale decode; None if the data cannot be decoded. Thread-safe, so
+        I/O threads compute it while reading.
+        """
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        try:
+            if buffer[:2].tobytes() == b"\xff\xd8":
+                # libjpeg scales in the DCT: close to an area reduction, and cheap
+                reduced = cv2.imdecode(buffer, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+            else:
+                # Other codecs decode in full anyway and OpenCV then subsamples,
+                # which aliases text; reduce by area instead
+                gray = cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+                reduced = self.reduce_for_signature(gray) if gray is not None else None
+        except Exception:
+            reduced = None
+        return self.reduced_signature(reduced) if reduced is not None else None
+
+    def content_signature(self, image: np.ndarray) -> Tuple[int, np.ndarray]:
+        """source_signature of an already decoded BGR frame."""
+        with self.metrics.stage("dedup"):
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+            return self.reduced_signature(self.reduce_for_signature(gray))
+
     def create_text_mask(self, image: np.ndarray, status_region: np.ndarray) -> np.ndarray:
         """
         Create mask for text/icons using multiple detection methods.
@@ -150,14 +1358,51 @@ class EnhancedImageProcessor:
 
         return combined_mask
 
+    def sample_band_background(self, status_region: np.ndarray) -> Tuple[np.ndarray, np.ndarray, bool]:
+        """
+        Estimate the status-bar background from the band itself.
+        Returns (median colour, mask of pixels deviating from it, uniform flag):
+        the background is uniform when most of the band is close to the median
+        and those pixels vary less than uniform_threshold.
+        """
+        background = np.median(status_region.reshape(-1, 3), axis=0)
+        deviation = np.abs(status_region.astype(np.int16) - background.astype(np.int16)).max(axis=2)
+        foreground = deviation > 24
+
+        background_pixels = status_region[~foreground]
+        uniform = (len(background_pixels) >= 0.5 * foreground.size and
+                   float(background_pixels.std(axis=0).max()) < self.uniform_threshold)
+
+        return background, foreground.astype(np.uint8) * 255, uniform
+
+    def inpaint_quality(self, before: np.ndarray, after: np.ndarray, mask: np.ndarray) -> float:
+        """
+        Share of the masked region's edge energy removed by cleaning
+        (1.0 = no text/icon edges left, 0.0 = unchanged).
+        """
+        region = cv2.dilate(mask, np.ones((3, 3), np.uint8)) > 0
+        edges_before = np.abs(cv2.Laplacian(cv2.cvtColor(before, cv2.COLOR_BGR2GRAY), cv2.CV_32F))[region]
+        edges_after = np.abs(cv2.Laplacian(cv2.cvtColor(after, cv2.COLOR_BGR2GRAY), cv2.CV_32F))[region]
+        if edges_before.size == 0 or edges_before.mean() == 0:
+            return 1.0
+        return float(np.clip(1.0 - edges_after.mean() / edges_before.mean(), 0.0, 1.0))
+
     def inpaint_status_bar(self, image: np.ndarray) -> np.ndarray:
         """
         Advanced status bar removal using inpainting to preserve background patterns.
+
+        Work is confined to the status band plus a small context margin. With the
+        "auto" strategy a uniform band background is flat-filled with its median
+        colour and only textured backgrounds go through cv2.inpaint (TELEA);
+        "flat", "ns" and "telea" force a tier. The tier, its cost and a quality
+        score are kept in last_inpaint_report.
         """
         height, width = image.shape[:2]
+        self.last_inpaint_report = None
 
-        # Detect status bar region
-        status_start, status_end = self.detect_status_bar_region(image)
+        # Detect status bar region (reusing the device profile when trusted)
+        with self.metrics.stage("detect"):
+            status_start, status_end = self.status_bar_region(image)
         status_height = status_end - status_start
 
         if status_height < 20:  # Too small to be status bar
@@ -165,12 +1410,29 @@ class EnhancedImageProcessor:
 
         self.logger.info(f"  🔍 Detected status bar: y={status_start}-{status_end} ({status_height}px)")
 
-        # Extract status bar region
-        status_region = image[status_start:status_end, :, :].copy()
+        started = time.perf_counter()
 
-        # Create text/icon mask
-        text_mask = self.create_text_mask(image, status_region)
-        text_pixels = np.sum(text_mask > 0)
+        # Crop the band plus enough rows above it for the inpainting radius
+        inpaint_radius = 3
+        crop_start = max(0, status_start - (inpaint_radius + 2))
+        crop = image[crop_start:status_end]
+        band_offset = status_start - crop_start
+        status_region = crop[band_offset:].copy()
+
+        with self.metrics.stage("mask"):
+            background, deviation_mask, uniform = self.sample_band_background(status_region)
+            strategy = self.inpaint_strategy
+            if strategy == "auto":
+                tier = "flat" if uniform else "telea"
+            else:
+                tier = strategy
+
+            # Create text/icon mask: a uniform background only needs the deviation mask
+            if tier == "flat":
+                text_mask = cv2.dilate(deviation_mask, np.ones((3, 3), np.uint8))
+            else:
+                text_mask = self.create_text_mask(image, status_region)
+            text_pixels = np.sum(text_mask > 0)
 
         self.logger.info(f"  📝 Detected {text_pixels} text/icon pixels to inpaint")
 
@@ -178,19 +1440,33 @@ class EnhancedImageProcessor:
             self.logger.warning("  ⚠️ Insufficient text detected, skipping inpainting")
             return image
 
-        # Create full-size mask for inpainting
-        full_mask = np.zeros((height, width), dtype=np.uint8)
-        full_mask[status_start:status_end, :] = text_mask
+        crop_mask = np.zeros(crop.shape[:2], dtype=np.uint8)
+        crop_mask[band_offset:] = text_mask
 
-        # Apply inpainting to preserve background patterns
-        try:
-            inpainted = cv2.inpaint(image, full_mask, inpaintRadius=3, flags=cv2.INPAINT_TELEA)
-            self.logger.info("  ✅ Inpainting completed successfully")
-            return inpainted
-        except Exception as e:
-            self.logger.error(f"  ❌ Inpainting failed: {e}")
-            # Fallback: simple fill with sampled background
-            return self.fallback_status_bar_removal(image, status_start, status_end)
+        with self.metrics.stage("inpaint"):
+            try:
+                if tier == "flat":
+                    cleaned_crop = crop.copy()
+                    cleaned_crop[crop_mask > 0] = background.astype(np.uint8)
+                else:
+                    flags = cv2.INPAINT_NS if tier == "ns" else cv2.INPAINT_TELEA
+                    cleaned_crop = cv2.inpaint(crop, crop_mask, inpaintRadius=inpaint_radius, flags=flags)
+            except Exception as e:
+                self.logger.error(f"  ❌ Inpainting failed: {e}")
+                # Fallback: simple fill with sampled background
+                return self.fallback_status_bar_removal(image, status_start, status_end)
+
+            inpainted = image.copy()
+            inpainted[status_start:status_end] = cleaned_crop[band_offset:]
+
+            cost_ms = (time.perf_counter() - started) * 1000
+            quality = self.inpaint_quality(crop[band_offset:], cleaned_crop[band_offset:], text_mask)
+        self.last_inpaint_report = {"tier": tier, "cost_ms": round(cost_ms, 2), "quality": round(quality, 3),
+                                    "uniform_background": bool(uniform), "masked_pixels": int(text_pixels)}
+
+        self.logger.info(f"  ✅ Inpainting completed successfully "
+                         f"(tier={tier}, {cost_ms:.1f}ms, quality={quality:.2f})")
+        return inpainted
 
     def fallback_status_bar_removal(self, image: np.ndarray, status_start: int, status_end: int) -> np.ndarray:
         """
@@ -217,21 +1493,68 @@ class EnhancedImageProcessor:
             self.logger.error(f"  ❌ Fallback removal failed: {e}")
             return image
 
-    def extract_features(self, image: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    def downscale(self, image: np.ndarray) -> np.ndarray:
+        """
+        Gaussian pyramid level of image used for grouping: the smallest pyrDown
+        level that is still at least proxy_width wide (unchanged if proxy_width
+        is 0 or the image is narrower than 2 * proxy_width).
+        """
+        if self.proxy_width <= 0:
+            return image
+        while (image.shape[1] + 1) // 2 >= self.proxy_width:
+            image = cv2.pyrDown(image)
+        return image
+
+    def image_proxy(self, image: np.ndarray) -> np.ndarray:
+        """Downscaled grayscale proxy of a BGR frame."""
+        return cv2.cvtColor(self.downscale(image), cv2.COLOR_BGR2GRAY)
+
+    def extract_features(self, image: np.ndarray, key: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
         """
         Extract ORB features and descriptors from image.
+
+        ORB runs on the downscaled proxy (see downscale); keypoint coordinates
+        and sizes are scaled back to full resolution. Results are served from
+        the content-addressed feature cache when the same pixels have been
+        featurized before (in this run or a previous one).
+        Keypoints are returned as an (N, 6) array of
+        x, y, size, angle, response, octave. key may pass a precomputed
+        content hash.
         """
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        key = key or self.feature_cache.content_hash(image)
+        cached = self.feature_cache.get(key)
+        if cached is not None:
+            return cached
+
+        return self.featurize_proxy(self.downscale(image), image.shape[1], key)
+
+    def featurize_proxy(self, small: np.ndarray, full_width: int, key: str) -> Tuple[np.ndarray, np.ndarray]:
+        """ORB (or histogram fallback) on a downscaled BGR or grayscale frame, stored under key."""
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        if self.orb is None:
+            self.orb = cv2.ORB_create(**self.orb_params)
         keypoints, descriptors = self.orb.detectAndCompute(gray, None)
 
         if descriptors is None:
-            # Fallback: return histogram features
-            hist = cv2.calcHist([image], [0, 1, 2], None, [8, 8, 8],
-                              [0, 256, 0, 256, 0, 256])
+            # Fallback: return histogram features (never matched, see record_similarities)
+            if small.ndim == 3:
+                hist = cv2.calcHist([small], [0, 1, 2], None, [8, 8, 8],
+                                  [0, 256, 0, 256, 0, 256])
+            else:
+                hist = cv2.calcHist([small], [0], None, [512], [0, 256])
             hist = cv2.normalize(hist, hist).flatten()
-            return np.array([]), hist.reshape(1, -1)
+            result = (np.array([]), hist.reshape(1, -1))
+        else:
+            scale = full_width / small.shape[1]
+            kp_array = np.array(
+                [(kp.pt[0] * scale, kp.pt[1] * scale, kp.size * scale, kp.angle, kp.response, kp.octave)
+                 for kp in keypoints],
+                dtype=np.float32
+            ).reshape(-1, 6)
+            result = (kp_array, descriptors)
 
-        return keypoints, descriptors
+        self.feature_cache.put(key, *result)
+        return result
 
     def calculate_feature_similarity(self, desc1: np.ndarray, desc2: np.ndarray) -> float:
         """
@@ -241,19 +1564,8 @@ class EnhancedImageProcessor:
             return 0.0
 
         try:
-            matches = self.bf.match(desc1, desc2)
-            if len(matches) == 0:
-                return 0.0
-
-            # Use ratio of good matches to total possible matches
-            distances = [m.distance for m in matches]
-            good_matches = sum(1 for d in distances if d < 50)  # Distance threshold
-
-            # Normalize by minimum descriptor count
-            min_descriptors = min(len(desc1), len(desc2))
-            similarity = good_matches / min_descriptors if min_descriptors > 0 else 0
-
-            return min(similarity, 1.0)
+            # Ratio of cross-checked matches closer than 50 to the smaller descriptor count
+            return float(self.matcher.similarities(desc1, [desc2])[0])
         except Exception as e:
             self.logger.warning(f"Feature matching failed: {e}")
             return 0.0
@@ -263,9 +1575,9 @@ class EnhancedImageProcessor:
         Fallback histogram similarity calculation.
         """
         try:
-            hist1 = cv2.calcHist([img1], [0, 1, 2], None, [8, 8, 8],
+            hist1 = cv2.calcHist([self.downscale(img1)], [0, 1, 2], None, [8, 8, 8],
                                [0, 256, 0, 256, 0, 256])
-            hist2 = cv2.calcHist([img2], [0, 1, 2], None, [8, 8, 8],
+            hist2 = cv2.calcHist([self.downscale(img2)], [0, 1, 2], None, [8, 8, 8],
                                [0, 256, 0, 256, 0, 256])
 
             hist1 = cv2.normalize(hist1, hist1).flatten()
@@ -276,6 +1588,91 @@ class EnhancedImageProcessor:
         except Exception as e:
             return 0.0
 
+    def build_record(self, filename: str, image: np.ndarray, keep_frame: bool = False) -> "ImageRecord":
+        """
+        Featurize an image and reduce it to an ImageRecord; the pixels can be
+        released afterwards. Features and the bottom-region statistic both come
+        from the downscaled proxy, which is built once. With keep_frame, the
+        frame and its grayscale proxy go to the frame store (if enabled).
+        """
+        key = self.feature_cache.content_hash(image)
+        small = self.downscale(image)
+        if self.feature_cache.get(key) is None:
+            self.featurize_proxy(small, image.shape[1], key)
+
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        bottom_std = float(np.std(gray[int(gray.shape[0] * 0.75):, :]))
+        if keep_frame and self.frame_store is not None:
+            self.frame_store.add(key, image, gray)
+
+        dominant_color, placeholder = self.describe_appearance(small)
+        return ImageRecord(filename, key, bottom_std, image.shape,
+                           dominant_color=dominant_color, placeholder=placeholder)
+
+    def describe_appearance(self, small: np.ndarray, placeholder_width: int = 16) -> Tuple[str, str]:
+        """
+        Dominant colour ("#rrggbb": the mean of the most populated 4-bit-per-channel
+        colour bin) and an inline low-quality placeholder (a placeholder_width
+        pixel wide WebP data URI, about 250 characters; PNG if WebP cannot be
+        encoded) of a downscaled BGR frame.
+        """
+        pixels = small.reshape(-1, 3)
+        quantized = (pixels >> 4).astype(np.int32)
+        bins = (quantized[:, 0] << 8) | (quantized[:, 1] << 4) | quantized[:, 2]
+        blue, green, red = pixels[bins == np.bincount(bins).argmax()].mean(axis=0)
+        dominant_color = f"#{int(red):02x}{int(green):02x}{int(blue):02x}"
+
+        height = max(1, round(small.shape[0] * placeholder_width / small.shape[1]))
+        tiny = cv2.resize(small, (placeholder_width, height), interpolation=cv2.INTER_AREA)
+        for fmt, params in (("webp", [cv2.IMWRITE_WEBP_QUALITY, 40]), ("png", [cv2.IMWRITE_PNG_COMPRESSION, 9])):
+            try:
+                ok, buffer = cv2.imencode(f".{fmt}", tiny, params)
+            except cv2.error:
+                ok = False
+            if ok:
+                return dominant_color, f"data:image/{fmt};base64,{base64.b64encode(buffer.tobytes()).decode('ascii')}"
+        return dominant_color, ""
+
+    def record_descriptors(self, record: "ImageRecord") -> np.ndarray:
+        """
+        Descriptors for a record, recomputed from its stored proxy, or else from its
+        output frame reloaded from disk, only if the feature cache no longer has them.
+        """
+        cached = self.feature_cache.get(record.feature_key)
+        if cached is not None:
+            return cached[1]
+
+        proxy = self.frame_store.proxy(record.feature_key) if self.frame_store is not None else None
+        if proxy is not None:
+            return self.featurize_proxy(proxy, record.shape[1], record.feature_key)[1]
+
+        image = self.load_output_image(record.filename)
+        if image is None:
+            return np.array([])
+        descriptors = self.extract_features(image)[1]
+        self.feature_cache.alias(record.feature_key, self.feature_cache.content_hash(image))
+        return descriptors
+
+    def record_similarities(self, record: "ImageRecord", others: List["ImageRecord"]) -> List[float]:
+        """
+        Similarity of record to each of others. Pairs already scored (in either
+        order) come from pair_similarities; the rest are matched in one batch.
+
+        extract_features never returns empty descriptors (it falls back to a
+        colour histogram), and histogram descriptors score 0 as they do with
+        calculate_feature_similarity, so records need no pixels.
+        """
+        keys = [tuple(sorted((record.feature_key, other.feature_key))) for other in others]
+        missing = [i for i, key in enumerate(keys) if key not in self.pair_similarities]
+
+        if missing:
+            scores = self.matcher.similarities(self.record_descriptors(record),
+                                               [self.record_descriptors(others[i]) for i in missing])
+            for i, score in zip(missing, scores):
+                self.pair_similarities[keys[i]] = float(score)
+
+        return [self.pair_similarities[key] for key in keys]
+
     def is_scrollable_screen(self, image: np.ndarray, similar_images: List[np.ndarray],
                            group_size: int) -> bool:
         """
@@ -284,29 +1681,38 @@ class EnhancedImageProcessor:
         if group_size < 3:
             return False
 
-        height, width = image.shape[:2]
+        records = [self.build_record(f"frame_{i}", img)
+                   for i, img in enumerate([image] + list(similar_images))]
+        return self.is_scrollable_group(records, group_size)
 
-        # Feature-based similarity analysis
-        _, desc1 = self.extract_features(image)
-        similarities = []
+    def is_scrollable_group(self, records: List["ImageRecord"], group_size: Optional[int] = None) -> bool:
+        """
+        Scrollable detection from image records: the first record is the sample,
+        compared against every other member.
+        """
+        return self.classify_group(records, group_size)["scrollable"]
 
-        for other_img in similar_images:
-            _, desc2 = self.extract_features(other_img)
-            if desc1.size > 0 and desc2.size > 0:
-                sim = self.calculate_feature_similarity(desc1, desc2)
-            else:
-                sim = self.calculate_histogram_similarity(image, other_img)
-            similarities.append(sim)
+    def classify_group(self, records: List["ImageRecord"], group_size: Optional[int] = None) -> Dict:
+        """
+        Classify one group from its image records as {"scrollable", "confidence",
+        "similarity"}. The first record is the sample; "similarity" is its mean
+        similarity to the other members.
+
+        "confidence" (0 to 1) is how strongly the members back the decision:
+        each member votes 0.5 plus its signed distance from the 0.4 similarity
+        threshold (scaled by 0.8, clipped), on the side of the decision, and the
+        votes are averaged. Singletons are certain; a pair of near-identical
+        frames, static because the group is too small, scores low.
+        """
+        group_size = len(records) if group_size is None else group_size
 
-        avg_similarity = np.mean(similarities) if similarities else 0
+        # Feature-based similarity analysis (pairs scored during grouping are reused)
+        similarities = self.record_similarities(records[0], records[1:]) if len(records) > 1 else []
 
-        # Content analysis: check for scrollable patterns
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        bottom_region = gray[int(height * 0.75):, :]
+        avg_similarity = float(np.mean(similarities)) if similarities else 0.0
 
-        # Look for content cutoff patterns (fade, cutoff text, etc.)
-        bottom_std = np.std(bottom_region)
-        bottom_mean = np.mean(bottom_region)
+        # Content analysis: varied content near the bottom suggests a cutoff (fade, cut text)
+        bottom_std = records[0].bottom_std
 
         # Scrollable indicators
         has_content_cutoff = bottom_std > 25  # Varied content near bottom
@@ -314,21 +1720,71 @@ class EnhancedImageProcessor:
         sufficient_group = group_size >= 3  # Multiple similar screens
 
         is_scrollable = high_similarity and (has_content_cutoff or sufficient_group)
+        if not sufficient_group:
+            is_scrollable = False  # Too few frames to be a scroll sequence
 
-        self.logger.info(f"  📊 Scrollable analysis: sim={avg_similarity:.2f}, "
-                        f"content_std={bottom_std:.1f}, group_size={group_size}, "
-                        f"scrollable={is_scrollable}")
+        direction = 1.0 if is_scrollable else -1.0
+        votes = [min(1.0, max(0.0, 0.5 + direction * (s - 0.4) / 0.8)) for s in similarities]
+        confidence = float(np.mean(votes)) if votes else 1.0
 
-        return is_scrollable
+        if group_size > 1:
+            self.logger.info(f"  📊 Scrollable analysis: sim={avg_similarity:.2f}, "
+                            f"content_std={bottom_std:.1f}, group_size={group_size}, "
+                            f"scrollable={is_scrollable}, confidence={confidence:.2f}")
 
-    def group_related_images(self, images: Dict[str, np.ndarray]) -> Dict[str, List[str]]:
+        return {"scrollable": is_scrollable, "confidence": round(confidence, 3),
+                "similarity": round(avg_similarity, 3)}
+
+    def classify_groups(self, groups: Dict[str, List[str]],
+                        records: Dict[str, "ImageRecord"]) -> Dict[str, Dict]:
+        """
+        classify_group over many groups as one stage, by group name. Only
+        records are used: sample/member pairs scored while grouping (seeds
+        against their candidates) come from pair_similarities, the rest are
+        matched in one batch per sample, and bottom statistics were taken when
+        each image was cleaned, so no pixels are loaded or featurized again.
+        """
+        keys = [tuple(sorted((records[members[0]].feature_key, records[m].feature_key)))
+                for members in groups.values() for m in members[1:]]
+        reused = sum(1 for key in keys if key in self.pair_similarities)
+
+        decisions = {name: self.classify_group([records[m] for m in members])
+                     for name, members in groups.items()}
+
+        uncertain = sum(1 for decision in decisions.values() if decision["confidence"] < 0.6)
+        self.logger.info(f"🧮 Classified {len(decisions)} groups: {reused} of {len(keys)} member pairs "
+                         f"reused from grouping, {uncertain} with confidence below 0.6")
+        return decisions
+
+    def group_related_images(self, images: Dict[str, np.ndarray],
+                             candidate_k: Optional[int] = None) -> Dict[str, List[str]]:
         """
         Enhanced grouping using feature matching for better accuracy.
         """
+        records = {filename: self.build_record(filename, image) for filename, image in images.items()}
+        return self.group_records(records, candidate_k)
+
+    def group_records(self, records: Dict[str, "ImageRecord"],
+                      candidate_k: Optional[int] = None) -> Dict[str, List[str]]:
+        """
+        Greedy grouping over image records: each unassigned seed collects every
+        remaining image whose similarity exceeds 0.3.
+
+        With candidate_k > 0 (default: self.candidate_k) each seed is only matched
+        against its candidate_k nearest screens from a CandidateIndex instead of
+        every remaining image.
+        """
         groups = {}
         processed: Set[str] = set()
+        candidate_k = self.candidate_k if candidate_k is None else candidate_k
+        names = list(records)
 
-        for filename, image in images.items():
+        index = None
+        if candidate_k > 0 and len(records) > candidate_k + 1:
+            index = CandidateIndex(names, lambda name: self.record_descriptors(records[name]))
+            self.logger.info(f"  🗂️ Indexed {len(records)} images, {candidate_k} candidates per seed")
+
+        for filename in names:
             if filename in processed:
                 continue
 
@@ -336,22 +1792,16 @@ class EnhancedImageProcessor:
             group = [filename]
             processed.add(filename)
 
-            # Extract features for this image
-            _, desc1 = self.extract_features(image)
-
-            # Find similar images
-            for other_filename, other_image in images.items():
-                if other_filename in processed:
-                    continue
-
-                _, desc2 = self.extract_features(other_image)
-
-                # Calculate similarity
-                if desc1.size > 0 and desc2.size > 0:
-                    similarity = self.calculate_feature_similarity(desc1, desc2)
-                else:
-                    similarity = self.calculate_histogram_similarity(image, other_image)
+            # Find similar images, scoring all remaining candidates in one batch
+            # (in input order, whichever way they were found)
+            if index is not None:
+                others = sorted((other for other in index.candidates(filename, candidate_k)
+                                 if other not in processed), key=index.position.__getitem__)
+            else:
+                others = [other for other in names if other not in processed]
+            similarities = self.record_similarities(records[filename], [records[o] for o in others])
 
+            for other_filename, similarity in zip(others, similarities):
                 # Group threshold: lower for feature matching
                 if similarity > 0.3:
                     group.append(other_filename)
@@ -361,32 +1811,224 @@ class EnhancedImageProcessor:
 
         return groups
 
-    def process_image_batch(self, image_batch: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    def candidate_recall_report(self, records: Dict[str, "ImageRecord"]) -> Dict[str, float]:
+        """
+        Compare indexed grouping against exhaustive matching.
+
+        Reports the fraction of all similar pairs (similarity > 0.3) that the
+        index proposes as candidates, and the fraction of exhaustive groups
+        reproduced exactly. Runs the full O(n^2) matching, so it is slow by design.
+        """
+        names = list(records)
+        index = CandidateIndex(names, lambda name: self.record_descriptors(records[name]))
+        candidates = {name: index.candidates(name, self.candidate_k) for name in names}
+        similar_pairs = 0
+        recalled_pairs = 0
+
+        for i, name in enumerate(names):
+            others = names[i + 1:]
+            similarities = self.record_similarities(records[name], [records[o] for o in others])
+            for other, similarity in zip(others, similarities):
+                if similarity > 0.3:
+                    similar_pairs += 1
+                    if other in candidates[name] or name in candidates[other]:
+                        recalled_pairs += 1
+
+        exhaustive = self.group_records(records, candidate_k=0)
+        indexed = self.group_records(records)
+        exhaustive_groups = {tuple(members) for members in exhaustive.values()}
+        indexed_groups = {tuple(members) for members in indexed.values()}
+
+        report = {
+            "images": len(names),
+            "candidate_k": self.candidate_k,
+            "similar_pairs": similar_pairs,
+            "pair_recall": recalled_pairs / similar_pairs if similar_pairs else 1.0,
+            "group_agreement": (len(exhaustive_groups & indexed_groups) / len(exhaustive_groups)
+                                if exhaustive_groups else 1.0),
+        }
+        self.logger.info(f"📐 Candidate recall: {report['pair_recall']:.3f} of {similar_pairs} similar pairs, "
+                         f"group agreement {report['group_agreement']:.3f}")
+        return report
+
+    def proxy_validation_report(self, records: Dict[str, "ImageRecord"]) -> Dict:
+        """
+        Compare grouping and classification on proxies against a full-resolution
+        run over the same output frames.
+
+        Both sides featurize the written outputs, so only the resolution
+        differs. Reports the fraction of image pairs on which both runs agree
+        (grouped together or apart), the fraction of full-resolution groups
+        reproduced exactly and, among those, the fraction classified the same
+        way (scrollable or static). Every frame is reloaded and featurized at full
+        size, so it is slow by design.
+        """
+        reference = EnhancedImageProcessor(**{**self.worker_settings(), "proxy_width": 0,
+                                              "candidate_k": self.candidate_k, "frame_store": False})
+        proxy_records, full_records = {}, {}
+        for name in records:
+            image = self.load_output_image(name)
+            if image is not None:
+                proxy_records[name] = self.build_record(name, image)
+                full_records[name] = reference.build_record(name, image)
+
+        proxy_groups = self.group_records(proxy_records)
+        full_groups = reference.group_records(full_records)
+        proxy_members = {tuple(members) for members in proxy_groups.values()}
+
+        proxy_label = {m: name for name, members in proxy_groups.items() for m in members}
+        full_label = {m: name for name, members in full_groups.items() for m in members}
+        names = list(full_records)
+        pairs = len(names) * (len(names) - 1) // 2
+        agreeing_pairs = sum(1 for i, a in enumerate(names) for b in names[i + 1:]
+                             if (proxy_label[a] == proxy_label[b]) == (full_label[a] == full_label[b]))
+
+        matched = [members for members in full_groups.values() if tuple(members) in proxy_members]
+        same_type = sum(1 for members in matched
+                        if self.is_scrollable_group([proxy_records[m] for m in members]) ==
+                        reference.is_scrollable_group([full_records[m] for m in members]))
+
+        report = {
+            "images": len(full_records),
+            "proxy_width": self.proxy_width,
+            "proxy_groups": len(proxy_groups),
+            "full_groups": len(full_groups),
+            "pair_agreement": agreeing_pairs / pairs if pairs else 1.0,
+            "group_agreement": len(matched) / len(full_groups) if full_groups else 1.0,
+            "classification_agreement": same_type / len(matched) if matched else 1.0,
+        }
+        self.logger.info(f"🔎 Proxy validation: pair agreement {report['pair_agreement']:.3f}, "
+                         f"group agreement {report['group_agreement']:.3f}, "
+                         f"classification agreement {report['classification_agreement']:.3f}")
+        return report
+
+    def worker_settings(self) -> Dict:
+        """Constructor arguments for the per-image processors in pool workers."""
+        return {
+            "screens_dir": str(self.screens_dir),
+            "cache_dir": self.cache_dir,
+            "workers": 1,
+            "incremental": False,
+            "profile_confirmations": self.device_profiles.confirmations if self.device_profiles else 0,
+            "inpaint_strategy": self.inpaint_strategy,
+            "uniform_threshold": self.uniform_threshold,
+            "metrics": self.metrics.enabled,
+            "proxy_width": self.proxy_width,
+            "variant_widths": self.variant_widths,
+            "variant_formats": self.variant_formats,
+            "frame_store": self.frame_store is not None,
+            "dedup": self.dedup,
+        }
+
+    def unique_output_filename(self, filename: str, taken, reserved: Collection[str] = ()) -> str:
+        """
+        Normalize filename and append _1, _2, ... until it does not collide with taken.
+        Names in reserved are only given to the file of that name.
+        """
+        new_filename = self.normalize_filename(filename)
+
+        counter = 1
+        original_name = new_filename
+        while new_filename in taken or (new_filename in reserved and new_filename != filename):
+            name_part = Path(original_name).stem
+            ext = Path(original_name).suffix
+            new_filename = f"{name_part}_{counter}{ext}"
+            counter += 1
+
+        return new_filename
+
+    def variant_writers(self) -> Tuple[str, ...]:
+        """The variant formats this OpenCV build can encode; the others are skipped with a warning."""
+        if self._variant_writers is None:
+            unsupported = [fmt for fmt in self.variant_formats
+                           if fmt not in VARIANT_FORMATS or not cv2.haveImageWriter(f"x.{fmt}")]
+            if unsupported:
+                self.logger.warning(f"⚠️ Skipping unsupported variant formats: {', '.join(unsupported)}")
+            self._variant_writers = tuple(fmt for fmt in self.variant_formats if fmt not in unsupported)
+        return self._variant_writers
+
+    def encode_variants(self, image: np.ndarray) -> Dict[str, bytes]:
+        """
+        Encode a cleaned frame for the web: every variant width narrower than the
+        frame, plus its own width, in every variant format (progressive JPEG,
+        WebP, AVIF). Returns bytes keyed by "<width>w.<format>".
+        """
+        height, width = image.shape[:2]
+        variants = {}
+        for target in sorted({w for w in self.variant_widths if w < width} | {width}):
+            frame = image if target == width else cv2.resize(
+                image, (target, max(1, round(height * target / width))), interpolation=cv2.INTER_AREA)
+            for fmt in self.variant_writers():
+                ok, buffer = cv2.imencode(f".{fmt}", frame, variant_encode_params(fmt))
+                if ok:
+                    variants[f"{target}w.{fmt}"] = buffer.tobytes()
+        return variants
+
+    def variant_files(self, filename: str, variants: Dict[str, bytes]) -> Dict[Path, bytes]:
+        """Paths under responsive/ for the encoded variants of output filename."""
+        stem = Path(filename).stem
+        return {self.responsive_dir / f"{stem}-{key}": data for key, data in variants.items()}
+
+    def image_metadata(self, record: "ImageRecord") -> Dict:
+        """
+        What the client needs before downloading an output: intrinsic size, a
+        content hash for cache busting, the dominant colour and an inline
+        placeholder. Fields that are unknown are left out.
+        """
+        metadata = {"width": int(record.shape[1]), "height": int(record.shape[0]),
+                    "contentHash": record.content_hash, "dominantColor": record.dominant_color,
+                    "placeholder": record.placeholder}
+        return {key: value for key, value in metadata.items() if value}
+
+    def image_sources(self, record: "ImageRecord") -> List[Dict[str, str]]:
+        """
+        srcset-style <source> entries for a record's variants, one per format in
+        preference order, each listing every width.
+        """
+        by_format: Dict[str, List[Tuple[int, str]]] = {}
+        for name in record.variants:
+            match = re.search(r'-(\d+)w\.(\w+)$', name)
+            if match:
+                by_format.setdefault(match.group(2), []).append((int(match.group(1)), name))
+
+        sources = []
+        for fmt in self.variant_formats:
+            if fmt in by_format:
+                srcset = ", ".join(f"assets/screens/responsive/{name} {width}w"
+                                   for width, name in sorted(by_format[fmt]))
+                sources.append({"type": VARIANT_FORMATS[fmt][0], "srcset": srcset})
+        return sources
+
+    def process_image_batch(self, image_batch: Dict[str, np.ndarray], taken: Optional[Set[str]] = None,
+                            source_names: Optional[Dict[str, str]] = None,
+                            reserved: Collection[str] = ()) -> Dict[str, np.ndarray]:
         """
         Process a batch of images with status bar removal.
+
+        Output names in taken are avoided and newly assigned names are added to it;
+        names in reserved are left to the source of that name.
+        If source_names is given it is filled with output name -> source name.
         """
         processed = {}
+        taken = taken if taken is not None else set()
+        source_names = source_names if source_names is not None else {}
 
         for filename, image in image_batch.items():
             try:
                 self.logger.info(f"🔄 Processing: {filename} ({image.shape})")
 
                 # Apply advanced status bar inpainting
-                cleaned_image = self.inpaint_status_bar(image)
-
-                # Normalize filename
-                new_filename = self.normalize_filename(filename)
+                with self.metrics.image(filename):
+                    cleaned_image = self.inpaint_status_bar(image)
 
-                # Handle duplicates
-                counter = 1
-                original_name = new_filename
-                while new_filename in processed:
-                    name_part = Path(original_name).stem
-                    ext = Path(original_name).suffix
-                    new_filename = f"{name_part}_{counter}{ext}"
-                    counter += 1
+                # Normalize filename and handle duplicates
+                new_filename = self.unique_output_filename(filename, taken, reserved)
 
                 processed[new_filename] = cleaned_image
+                taken.add(new_filename)
+                source_names[new_filename] = filename
+                if self.last_inpaint_report:
+                    self.inpaint_reports[new_filename] = self.last_inpaint_report
 
                 self.logger.info(f"  ✅ Processed: {filename} -> {new_filename}")
 
@@ -394,9 +2036,239 @@ class EnhancedImageProcessor:
                 self.logger.error(f"  ❌ Failed to process {filename}: {e}")
                 # Keep original on failure
                 processed[filename] = image
+                taken.add(filename)
+                source_names[filename] = filename
 
         return processed
 
+    def clean_image_file(self, img_file: Path, sign: bool = True
+                         ) -> Tuple[str, Optional["ImageRecord"], Optional[bytes], Dict[str, bytes], bool]:
+        """
+        Decode, clean, featurize and encode a single file (runs inside pool workers).
+        Returns (source name, record, encoded bytes, encoded variants, success flag);
+        record is None if the file could not be decoded. Only the record and the
+        encoded bytes travel back to the parent, never the decoded frame. With
+        sign and dedup on, the record carries the source's signature.
+        """
+        with self.metrics.image(img_file.name):
+            try:
+                with self.metrics.stage("load"):
+                    data = img_file.read_bytes()
+                    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            except Exception as e:
+                self.logger.error(f"❌ Error loading {img_file.name}: {e}")
+                return img_file.name, None, None, {}, False
+
+            if image is None:
+                self.logger.warning(f"❌ Failed to load: {img_file.name}")
+                return img_file.name, None, None, {}, False
+
+            signature = None
+            if sign and self.dedup:
+                with self.metrics.stage("dedup"):
+                    signature = self.source_signature(data)
+            del data
+            record, encoded, variants, success = self.clean_frame(img_file.name, image, signature)
+
+        record.stage_metrics = self.metrics.drain()
+        return img_file.name, record, encoded, variants, success
+
+    def clean_frame(self, name: str, image: np.ndarray, signature: Optional[Tuple[int, np.ndarray]] = None
+                    ) -> Tuple["ImageRecord", Optional[bytes], Dict[str, bytes], bool]:
+        """
+        Clean, featurize and encode one decoded screenshot. Returns (record,
+        encoded JPEG bytes, encoded variants, success flag). On cleaning failure
+        the original image is used, encoded with name's extension. The record
+        carries the source's near-duplicate signature, if given.
+        """
+        try:
+            self.logger.info(f"🔄 Processing: {name} ({image.shape})")
+            cleaned_image = self.inpaint_status_bar(image)
+            with self.metrics.stage("encode"):
+                ok, encoded = cv2.imencode(".jpg", cleaned_image)
+                if not ok:
+                    raise ValueError("JPEG encoding failed")
+                variants = self.encode_variants(cleaned_image)
+            with self.metrics.stage("featurize"):
+                record = self.build_record(name, cleaned_image, keep_frame=True)
+            record.inpaint_report = self.last_inpaint_report
+            success = True
+        except Exception as e:
+            self.logger.error(f"  ❌ Failed to process {name}: {e}")
+            ok, encoded = cv2.imencode(Path(name).suffix, image)
+            variants = self.encode_variants(image)
+            record = self.build_record(name, image, keep_frame=True)
+            success = False
+
+        record.signature = signature
+        return record, encoded.tobytes() if ok else None, variants, success
+
+    def process_files_parallel(self, pool: ProcessPoolExecutor, batch_files: List[Path],
+                               taken: Optional[Set[str]] = None,
+                               source_names: Optional[Dict[str, str]] = None,
+                               reserved: Collection[str] = ()
+                               ) -> Tuple[Dict[str, "ImageRecord"], Dict[str, bytes],
+                                          Dict[str, Dict[str, bytes]]]:
+        """
+        Fan decode/inpaint/featurize/encode of a batch out over the process pool.
+
+        At most 2 * workers tasks are in flight. Results are consumed in input
+        order, so output filenames and duplicate suffixes match the serial path.
+        Returns (image records, encoded bytes, encoded variants) keyed by output
+        filename.
+        """
+        return self.assign_outputs(self.clean_files(pool, batch_files), taken, source_names, reserved)
+
+    def clean_files(self, pool: Optional[ProcessPoolExecutor],
+                    files: Iterable[Path]) -> Iterator[Tuple[str, Optional["ImageRecord"], Optional[bytes],
+                                                             Dict[str, bytes], bool]]:
+        """
+        clean_image_file results in input order: from the pool with at most
+        2 * workers tasks in flight, or in this process if pool is None.
+        """
+        if pool is None:
+            for img_file in files:
+                yield self.clean_image_file(img_file)
+            return
+
+        in_flight = deque()
+        for img_file in files:
+            if len(in_flight) >= self.workers * 2:
+                yield in_flight.popleft().result()
+            in_flight.append(pool.submit(_clean_image_worker, str(img_file)))
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    def clean_unique_files(self, pool: ProcessPoolExecutor,
+                           sources: Iterable[Tuple[Path, Optional[np.ndarray], str,
+                                                   Optional[Tuple[int, np.ndarray]]]],
+                           duplicates: NearDuplicateIndex, run_records: Dict[str, "ImageRecord"]
+                           ) -> Iterator[Tuple[str, Optional["ImageRecord"], Optional[bytes],
+                                               Dict[str, bytes], bool]]:
+        """
+        clean_files over prefetched (path, image, hash, signature) sources, with
+        repeats of an earlier source returned as duplicate_result()s instead of
+        reaching the pool. run_records collects cleaned records by source name.
+        """
+        in_flight = deque()
+
+        def next_result():
+            name, task = in_flight.popleft()
+            if isinstance(task, str):
+                return self.duplicate_result(name, task, run_records)
+            result = task.result()
+            run_records[name] = result[1]
+            return result
+
+        for img_file, _, _, signature in sources:
+            representative = None
+            if signature is not None:
+                representative = duplicates.match(img_file.name, signature)
+            if representative is not None:
+                in_flight.append((img_file.name, representative))
+                continue
+            while sum(not isinstance(task, str) for _, task in in_flight) >= self.workers * 2:
+                yield next_result()
+            in_flight.append((img_file.name, pool.submit(_clean_image_worker, str(img_file), False)))
+        while in_flight:
+            yield next_result()
+
+    def collapse_duplicates(self, results: Iterable[Tuple[str, Optional["ImageRecord"], Optional[bytes],
+                                                          Dict[str, bytes], bool]],
+                            duplicates: NearDuplicateIndex, run_records: Dict[str, "ImageRecord"]
+                            ) -> Iterator[Tuple[str, Optional["ImageRecord"], Optional[bytes],
+                                                Dict[str, bytes], bool]]:
+        """
+        Results already cleaned (by shards, which cannot see each other's
+        sources), in order, with repeats of an earlier result replaced by
+        duplicate_result()s, as if they had been matched before cleaning.
+        """
+        for result in results:
+            name, record = result[0], result[1]
+            representative = (duplicates.match(name, record.signature)
+                              if record is not None and record.signature is not None else None)
+            if representative is not None:
+                yield self.duplicate_result(name, representative, run_records)
+            else:
+                run_records[name] = record
+                yield result
+
+    def duplicate_result(self, name: str, representative: str, run_records: Dict[str, "ImageRecord"]
+                         ) -> Tuple[str, Optional["ImageRecord"], Optional[bytes], Dict[str, bytes], bool]:
+        """
+        The clean_image_file result of a source collapsed onto representative
+        (a source name in run_records, already given its output name): a copy of
+        its record, with no encoded data. The output and variants are copied from
+        the representative's when the batch commits.
+        """
+        rep_record = run_records.get(representative)
+        if rep_record is None:
+            self.logger.warning(f"❌ {name} repeats {representative}, which could not be loaded")
+            return name, None, None, {}, False
+
+        record = ImageRecord.from_dict(name, rep_record.to_dict())
+        record.duplicate_of = rep_record.filename
+        self.logger.info(f"  🪞 {name} repeats {representative}: reusing {rep_record.filename}")
+        return name, record, None, {}, True
+
+    def output_variants(self, record: "ImageRecord") -> Dict[str, bytes]:
+        """A published output's variant files read back, keyed like encode_variants()."""
+        prefix = len(Path(record.filename).stem) + 1
+        return {name[prefix:]: (self.responsive_dir / name).read_bytes() for name in record.variants}
+
+    def assign_outputs(self, results: Iterable[Tuple[str, Optional["ImageRecord"], Optional[bytes],
+                                                     Dict[str, bytes], bool]],
+                       taken: Optional[Set[str]] = None,
+                       source_names: Optional[Dict[str, str]] = None,
+                       reserved: Collection[str] = ()
+                       ) -> Tuple[Dict[str, "ImageRecord"], Dict[str, bytes], Dict[str, Dict[str, bytes]]]:
+        """
+        Give clean_image_file results their output filenames, in order: names in
+        taken are avoided and new ones added to it, names in reserved are left to
+        the source of that name, and files that failed to clean keep their source
+        name. source_names is filled with output name -> source name. Returns
+        (image records, encoded bytes, encoded variants) keyed by output
+        filename; files that could not be decoded are dropped.
+        """
+        processed = {}
+        encoded_batch = {}
+        variant_batch = {}
+        taken = taken if taken is not None else set()
+        source_names = source_names if source_names is not None else {}
+
+        for filename, record, encoded, variants, success in results:
+            if record is None:
+                continue
+            new_filename = self.unique_output_filename(filename, taken, reserved) if success else filename
+            record.filename = new_filename
+            processed[new_filename] = record
+            if record.inpaint_report:
+                self.inpaint_reports[new_filename] = record.inpaint_report
+            self.metrics.merge(record.stage_metrics)
+            taken.add(new_filename)
+            source_names[new_filename] = filename
+            if encoded is not None:
+                encoded_batch[new_filename] = encoded
+            variant_batch[new_filename] = variants
+            if success:
+                self.logger.info(f"  ✅ Processed: {filename} -> {new_filename}")
+
+        return processed, encoded_batch, variant_batch
+
+    def start_pool(self) -> Tuple[ProcessPoolExecutor, QueueListener]:
+        """Worker pool for clean_image_file, with worker log records forwarded to this process's handlers."""
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.logger.info(f"⚙️ Using process pool with {self.workers} workers")
+        root = logging.getLogger()
+        log_queue = multiprocessing.Queue()
+        log_listener = QueueListener(log_queue, *root.handlers, respect_handler_level=True)
+        log_listener.start()
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                   initargs=(self.worker_settings(), log_queue, root.level))
+        return pool, log_listener
+
     def load_images_batch(self, image_files: List[Path], start_idx: int, batch_size: int) -> Dict[str, np.ndarray]:
         """
         Load a batch of images to avoid memory issues.
@@ -407,7 +2279,8 @@ class EnhancedImageProcessor:
         for i in range(start_idx, end_idx):
             img_file = image_files[i]
             try:
-                img = cv2.imread(str(img_file))
+                with self.metrics.image(img_file.name), self.metrics.stage("load"):
+                    img = cv2.imread(str(img_file))
                 if img is not None:
                     batch[img_file.name] = img
                     self.logger.info(f"✅ Loaded: {img_file.name}")
@@ -418,113 +2291,933 @@ class EnhancedImageProcessor:
 
         return batch
 
-    def process_all_images(self) -> Dict[str, int]:
+    def save_inpaint_report(self) -> Dict:
         """
-        Main batched processing pipeline with comprehensive logging.
+        Write per-image cleaning tier, cost and quality for this run, plus
+        per-tier totals, to .cache/inpaint_report.json.
         """
-        self.logger.info("🚀 Starting enhanced automated image processing...")
+        tiers: Dict[str, Dict] = {}
+        for report in self.inpaint_reports.values():
+            tier = tiers.setdefault(report["tier"], {"images": 0, "cost_ms": 0.0, "quality": 0.0})
+            tier["images"] += 1
+            tier["cost_ms"] += report["cost_ms"]
+            tier["quality"] += report["quality"]
+
+        for name, tier in tiers.items():
+            tier["mean_cost_ms"] = round(tier.pop("cost_ms") / tier["images"], 2)
+            tier["mean_quality"] = round(tier.pop("quality") / tier["images"], 3)
+            self.logger.info(f"🧽 Tier {name}: {tier['images']} images, "
+                             f"{tier['mean_cost_ms']}ms avg, quality {tier['mean_quality']}")
+
+        summary = {"strategy": self.inpaint_strategy, "tiers": tiers, "images": self.inpaint_reports}
+        report_path = self.screens_dir / ".cache" / "inpaint_report.json"
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        return summary
+
+    def save_duplicate_report(self, collapsed: List[Dict[str, str]]) -> None:
+        """
+        Write the sources collapsed onto a representative this run (see
+        NearDuplicateIndex) to .cache/duplicates.json.
+        """
+        if collapsed:
+            self.logger.info(f"🪞 Collapsed {len(collapsed)} near-duplicate screenshots onto "
+                             f"{len({entry['representative'] for entry in collapsed})} representatives")
+        report_path = self.screens_dir / ".cache" / "duplicates.json"
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump({"collapsed": collapsed}, f, indent=2, ensure_ascii=False)
+
+    def save_classification_report(self, decisions: Dict[str, Dict]) -> None:
+        """
+        Write every group's classify_group decision, with confidence, to
+        .cache/classification.json.
+        """
+        report_path = self.screens_dir / ".cache" / "classification.json"
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump({"groups": decisions}, f, indent=2, ensure_ascii=False)
+
+    def restore_originals(self) -> List[str]:
+        """
+        Put every backed-up original back into the screens directory. The
+        manifest is dropped, so the next run reprocesses the restored files.
+        """
+        store = BackupStore(self.backup_dir)
+        restored = store.restore(self.screens_dir)
+        if restored:
+            self.manifest_path.unlink(missing_ok=True)
+        for name in sorted(set(store.files) - set(restored)):
+            self.logger.warning(f"⚠️ Backup of {name} is missing or damaged, not restored")
+        self.logger.info(f"♻️ Restored {len(restored)} original images from {self.backup_dir}")
+        return restored
+
+    def file_hash(self, path: Path) -> str:
+        """
+        SHA-1 of a file's bytes, read in chunks. Digests are remembered per path
+        with the file's size and mtime, so a long-lived processor (see watch)
+        only rereads files that changed.
+        """
+        stat = path.stat()
+        cached = self._file_hashes.get(path)
+        if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        self._file_hashes[path] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+        return digest.hexdigest()
+
+    def manifest_params(self) -> Dict:
+        """Parameters that invalidate every manifest entry when they change."""
+        return {"version": MANIFEST_VERSION, "orb": self.orb_params, "proxy_width": self.proxy_width,
+                "profile_confirmations": self.device_profiles.confirmations if self.device_profiles else 0,
+                "inpaint": {"strategy": self.inpaint_strategy, "uniform_threshold": self.uniform_threshold},
+                "variants": {"widths": list(self.variant_widths), "formats": list(self.variant_formats)},
+                "stitch": {"enabled": self.stitch, "tile_height": self.stitch_tile_height}}
+
+    def load_manifest(self) -> Dict:
+        """
+        Load the processing manifest, or return an empty one if it is missing,
+        unreadable or was produced with different parameters.
+        """
+        empty = {"params": self.manifest_params(), "files": {}, "groups": []}
+        if not self.incremental or not self.manifest_path.exists():
+            return empty
+
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Ignoring unreadable manifest: {e}")
+            return empty
+
+        if manifest.get("params") != self.manifest_params():
+            self.logger.info("♻️ Processing parameters changed, running full reprocess")
+            return empty
+
+        manifest.setdefault("files", {})
+        manifest.setdefault("groups", [])
+        return manifest
+
+    def save_manifest(self, manifest: Dict) -> None:
+        """Atomically write the manifest so an interrupted run can resume from it."""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def load_output_image(self, filename: str) -> Optional[np.ndarray]:
+        """Reload a previously written output image from the screens directory."""
+        return cv2.imread(str(self.screens_dir / filename))
+
+    def output_frame(self, record: "ImageRecord") -> Optional[np.ndarray]:
+        """
+        Full-resolution pixels of a record's output: a read-only view into the
+        frame store when it holds them, otherwise the decoded output file.
+        """
+        if self.frame_store is not None:
+            frame = self.frame_store.frame(record.feature_key)
+            if frame is not None:
+                return frame
+        return self.load_output_image(record.filename)
+
+    def extend_groups(self, groups: Dict[str, List[str]], seed_records: Dict[str, "ImageRecord"],
+                      records: Dict[str, "ImageRecord"]) -> Dict[str, List[str]]:
+        """
+        Add new images to existing groups by comparing them with each group's seed
+        (its first member), as group_records does. Images that match no seed are
+        grouped among themselves.
+        """
+        remaining = {}
+
+        for filename, record in records.items():
+            matched = None
+            group_names = list(groups)
+            similarities = self.record_similarities(record, [seed_records[g] for g in group_names])
+
+            for group_name, similarity in zip(group_names, similarities):
+                if similarity > 0.3:
+                    matched = group_name
+                    break
+
+            if matched is not None:
+                groups[matched].append(filename)
+                self.logger.info(f"  ➕ {filename} joined existing group {matched}")
+            else:
+                remaining[filename] = record
+
+        groups.update(self.group_records(remaining))
+        return groups
+
+    def pinned_rows(self, grays: List[np.ndarray], from_top: bool = True, tolerance: float = 3.0) -> int:
+        """
+        Height of a pinned header (or, from the bottom, tab bar): the leading
+        (trailing) rows that stay the same, within JPEG noise, between the first
+        frame and another. The median over frames keeps one stray group member
+        from shrinking it.
+        """
+        reference = grays[0].astype(np.int16)
+        counts = []
+        for gray in grays[1:]:
+            row_error = np.abs(gray.astype(np.int16) - reference).mean(axis=1)
+            moving = np.flatnonzero(row_error >= tolerance)
+            if len(moving) == 0:
+                counts.append(reference.shape[0])
+            else:
+                counts.append(int(moving[0]) if from_top else int(reference.shape[0] - 1 - moving[-1]))
+        return int(np.median(counts)) if counts else 0
+
+    def estimate_scroll_offset(self, upper: np.ndarray, lower: np.ndarray,
+                               max_error: float = 4.0) -> Optional[int]:
+        """
+        Vertical scroll between two grayscale content bands of equal size: the dy
+        for which upper[dy:] best matches lower[:-dy] (negative when lower is
+        scrolled above upper), from a mean absolute difference over 32-column
+        row signatures, searched on every 4th row and refined at full
+        resolution. None if no shift leaves at least 10% of the band
+        overlapping within max_error grey levels.
+        """
+        height = upper.shape[0]
+        min_overlap = max(16, height // 10)
+        if height <= min_overlap:
+            return None
+
+        def signature(band: np.ndarray, rows: int) -> np.ndarray:
+            return cv2.resize(band, (32, rows), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+        def best_shift(a: np.ndarray, b: np.ndarray, shifts) -> Tuple[int, float]:
+            errors = [float(np.abs(a[dy:] - b[:len(b) - dy]).mean()) for dy in shifts]
+            i = int(np.argmin(errors))
+            return shifts[i], errors[i]
+
+        step = 4
+        coarse_rows = height // step
+        coarse_shifts = list(range(0, coarse_rows - min_overlap // step + 1))
+        coarse_a, coarse_b = signature(upper, coarse_rows), signature(lower, coarse_rows)
+        fine_a, fine_b = signature(upper, height), signature(lower, height)
+
+        best = None
+        for sign, (a, b, fa, fb) in ((1, (coarse_a, coarse_b, fine_a, fine_b)),
+                                     (-1, (coarse_b, coarse_a, fine_b, fine_a))):
+            coarse, _ = best_shift(a, b, coarse_shifts)
+            shifts = [dy for dy in range(coarse * step - step, coarse * step + step + 1)
+                      if 0 <= dy <= height - min_overlap]
+            dy, error = best_shift(fa, fb, shifts)
+            if best is None or error < best[1]:
+                best = (sign * dy, error)
+
+        return best[0] if best[1] < max_error else None
+
+    def stitch_group(self, group_name: str, records: List["ImageRecord"]) -> Optional[Dict]:
+        """
+        Stitch a scrollable group's frames into one long image, keeping the pinned
+        header and tab bar once and adding only newly scrolled rows per frame.
+        Writes tiles under stitched/ and returns the screens.json "stitched" entry,
+        or None if the frames are unreadable or of different sizes.
+        """
+        frames = [self.output_frame(record) for record in records]
+        if any(frame is None for frame in frames) or len({frame.shape for frame in frames}) != 1:
+            self.logger.warning(f"  ⚠️ Cannot stitch {group_name}: frames missing or of different sizes")
+            return None
+
+        height, width = frames[0].shape[:2]
+        grays = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames]
+        header = min(self.pinned_rows(grays, from_top=True), int(height * 0.4))
+        footer = min(self.pinned_rows(grays, from_top=False), int(height * 0.25))
+
+        # Scroll position of each frame's content band (between the pinned header
+        # and tab bar), relative to the first frame
+        content = height - header - footer
+        bands = [gray[header:height - footer] for gray in grays]
+        positions: Dict[int, int] = {0: 0}
+        frontier = [0]
+        while frontier:
+            placed = frontier.pop(0)
+            for i in range(len(frames)):
+                if i in positions:
+                    continue
+                dy = self.estimate_scroll_offset(bands[placed], bands[i])
+                if dy is not None:
+                    positions[i] = positions[placed] + dy
+                    frontier.append(i)
+
+        # Lay frames out top to bottom; each adds only the rows below the previous one
+        order = sorted(positions, key=lambda i: (positions[i], i))
+        top = positions[order[0]]
+        offsets = [0] * len(frames)
+        parts = [frames[order[0]][:header]]
+        bottom = top
+        for i in order + [i for i in range(len(frames)) if i not in positions]:
+            position = positions.get(i, bottom)
+            start = max(0, bottom - position) if i in positions else 0
+            if start < content:
+                parts.append(frames[i][header + start:height - footer])
+                bottom = position + content if i in positions else bottom + content
+            offsets[i] = (position if i in positions else bottom - content) - top
+        if footer:
+            parts.append(frames[order[-1]][height - footer:])
+        stitched = np.vstack(parts)
+
+        tiles = []
+        for index, y in enumerate(range(0, stitched.shape[0], self.stitch_tile_height)):
+            tile = stitched[y:y + self.stitch_tile_height]
+            tile_name = f"{group_name}-{index}.jpg"
+            ok, buffer = cv2.imencode(".jpg", tile)
+            if not ok:
+                self.logger.warning(f"  ⚠️ Cannot encode stitched tile {tile_name}")
+                return None
+            self.write_generated(self.stitched_dir / tile_name, buffer.tobytes())
+
+            variant_files = self.variant_files(tile_name, self.encode_variants(tile))
+            for path, data in variant_files.items():
+                self.write_generated(path, data)
+            tile_record = ImageRecord(tile_name, "", 0.0, tile.shape, [path.name for path in variant_files])
+
+            entry = {"src": f"assets/screens/stitched/{tile_name}", "y": y, "height": int(tile.shape[0]),
+                     "contentHash": hashlib.sha1(buffer).hexdigest()}
+            sources = self.image_sources(tile_record)
+            if sources:
+                entry["sources"] = sources
+            tiles.append(entry)
+
+        saved = 1 - stitched.shape[0] / (height * len(frames))
+        self.logger.info(f"  🧵 Stitched {group_name}: {len(frames)} frames -> {stitched.shape[0]}px "
+                         f"in {len(tiles)} tile(s), header {header}px, {saved:.0%} fewer rows")
+        return {
+            "width": width,
+            "height": int(stitched.shape[0]),
+            "frameHeight": height,
+            "headerHeight": header,
+            "footerHeight": footer,
+            "frameOffsets": offsets,
+            "tiles": tiles,
+        }
+
+    def prune_generated(self, screens_data: List[Dict]) -> int:
+        """
+        Delete files under stitched/ and responsive/ that screens_data no longer
+        refers to (tiles of regrouped screens, variants of replaced outputs or
+        of dropped formats). Returns how many were removed.
+        """
+        referenced: Set[str] = set()
+
+        def collect(value) -> None:
+            if isinstance(value, dict):
+                for item in value.values():
+                    collect(item)
+            elif isinstance(value, list):
+                for item in value:
+                    collect(item)
+            elif isinstance(value, str):
+                referenced.update(re.findall(r'assets/screens/(\S+)', value))
+
+        collect(screens_data)
+        removed = 0
+        for directory in (self.stitched_dir, self.responsive_dir):
+            if not directory.is_dir():
+                continue
+            for path in directory.iterdir():
+                if path.is_file() and path.relative_to(self.screens_dir).as_posix() not in referenced:
+                    path.unlink()
+                    removed += 1
+        return removed
+
+    def write_generated(self, path: Path, data: bytes) -> None:
+        """
+        Write a file generated under the screens directory, or for the in-memory
+        API keep it in memory_files under its path relative to that directory.
+        """
+        if self.memory_files is not None:
+            self.memory_files[path.relative_to(self.screens_dir).as_posix()] = data
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+    def build_group_screens(self, group_name: str, filenames: List[str],
+                            records: Dict[str, "ImageRecord"],
+                            decision: Optional[Dict] = None) -> List[Dict]:
+        """
+        Build the screens.json entries for one group, scrollable or a set of
+        static screens as decided by classify_group (run here unless decision,
+        its result, is given). Outputs with responsive variants
+        carry srcset-style "sources" ("imageSources" per frame for scrollables);
+        "src" stays the full-size fallback. Every entry carries the metadata of
+        its "src" (see image_metadata), and scrollables also "imageMeta" per
+        frame. Scrollable groups also get a "stitched" long image (see
+        stitch_group); "images" stays as the fallback.
+        """
+        group_size = len(filenames)
+
+        def with_sources(entry: Dict, filename: str) -> Dict:
+            entry.update(self.image_metadata(records[filename]))
+            sources = self.image_sources(records[filename])
+            if sources:
+                entry["sources"] = sources
+            return entry
+
+        if group_size == 1:
+            # Single static screen
+            filename = filenames[0]
+            self.logger.info(f"  📄 Static: {filename}")
+            return [with_sources({
+                "src": f"assets/screens/{filename}",
+                "id": Path(filename).stem,
+                "type": "static"
+            }, filename)]
+
+        # Multiple images - analyze for scrollable
+        if decision is None:
+            decision = self.classify_group([records[f] for f in filenames])
+        is_scrollable = decision["scrollable"]
+
+        if is_scrollable:
+            self.logger.info(f"  📜 Scrollable: {group_name} ({group_size} images)")
+            entry = with_sources({
+                "src": f"assets/screens/{filenames[0]}",
+                "id": group_name,
+                "type": "scrollable",
+                "images": [f"assets/screens/{f}" for f in filenames],
+                "pinnedHeaderHeight": "15%"
+            }, filenames[0])
+            image_sources = [self.image_sources(records[f]) for f in filenames]
+            if any(image_sources):
+                entry["imageSources"] = image_sources
+            entry["imageMeta"] = [self.image_metadata(records[f]) for f in filenames]
+            if self.stitch:
+                with self.metrics.stage("stitch"):
+                    stitched = self.stitch_group(group_name, [records[f] for f in filenames])
+                if stitched:
+                    entry["stitched"] = stitched
+                    if stitched["headerHeight"]:
+                        entry["pinnedHeaderHeight"] = f"{stitched['headerHeight'] / stitched['frameHeight']:.1%}"
+            return [entry]
+
+        # Multiple static screens
+        self.logger.info(f"  📄 Multiple static: {group_name} ({group_size} images)")
+        return [with_sources({
+            "src": f"assets/screens/{filename}",
+            "id": f"{group_name}_{Path(filename).stem}",
+            "type": "static"
+        }, filename) for filename in filenames]
+
+    def select_sources(self, entries: Dict[str, Dict], pending: Collection[str] = ()) -> List[Path]:
+        """
+        Image files that need processing, in name order: new sources, sources
+        changed since their manifest entry, and sources whose output is missing
+        or was modified on disk. A file that replaced an output is itself a new
+        source, unless it is one of the pending outputs an interrupted run was
+        committing. Entries of those and of removed sources are deleted from
+        entries; unchanged sources, and intact outputs written by earlier runs,
+        are left alone.
+        """
+        # Outputs written by earlier runs are not new sources
+        known_outputs = {entry["output"]: entry["output_hash"] for entry in entries.values()}
 
-        # Get all image files
         image_extensions = {'.jpg', '.jpeg', '.png', '.bmp'}
-        image_files = [
-            f for f in self.screens_dir.iterdir()
-            if f.is_file() and f.suffix.lower() in image_extensions
-        ]
+        candidates = [f for f in sorted(self.screens_dir.iterdir())
+                      if f.is_file() and f.suffix.lower() in image_extensions]
+        present = {f.name for f in candidates}
+        digests = {f.name: self.file_hash(f) for f in candidates
+                   if f.name in entries or f.name in known_outputs}
+        verified_outputs = {name for name, digest in digests.items() if known_outputs.get(name) == digest}
+
+        image_files = []
+        unchanged: Set[str] = set()
+        for f in candidates:
+            entry = entries.get(f.name)
+            if entry is None:
+                # Anything but an intact or pending earlier output is new, and gets
+                # backed up before that output's source (if still here) is cleaned again
+                if f.name in verified_outputs or f.name in pending:
+                    continue
+                image_files.append(f)
+            elif entry["output"] in verified_outputs and (digests[f.name] == entry["hash"] or
+                                                          entry["output"] == f.name):
+                unchanged.add(f.name)
+            else:
+                image_files.append(f)
+
+        # Sources deleted after processing keep their entry while the output is intact
+        for name, entry in entries.items():
+            if name not in present and entry["output"] in verified_outputs:
+                unchanged.add(name)
+
+        removed = {name for name in entries if name not in unchanged}
+        for name in removed:
+            del entries[name]
+
+        self.logger.info(f"📁 Found {len(image_files)} images to process "
+                         f"({len(unchanged)} unchanged, {len(removed)} changed/removed)")
+        return image_files
+
+    def process_all_images(self, shard_results: Optional[Dict[str, Tuple[int, int, Dict]]] = None
+                           ) -> Dict[str, int]:
+        """
+        Main batched processing pipeline with comprehensive logging.
+
+        A manifest records each source's hash, its output and the resulting
+        groups. Reruns skip unchanged sources, regroup only groups touched by new,
+        changed or removed files, and resume after an interrupted run.
+
+        Grouping and classification work from ImageRecords only; decoded frames
+        never outlive their batch.
+
+        With shard_results (see merge_shards), cleaning is replaced by the shards'
+        results for every selected source; everything else is unchanged.
+        """
+        self.logger.info("🚀 Starting enhanced automated image processing...")
 
-        if not image_files:
+        manifest = self.load_manifest()
+        entries: Dict[str, Dict] = manifest["files"]
+        known_entries = len(entries)
+        self.run_snapshot = self.source_snapshot()
+        self.run_outputs = set()
+        output_sources = {entry["output"]: name for name, entry in entries.items()}
+        image_files = self.select_sources(entries, manifest.get("pending", ()))
+        # A new file where another source's output was keeps its name; that
+        # source's output moves to a suffixed name instead of replacing it
+        reserved = {f.name for f in image_files if output_sources.get(f.name, f.name) != f.name}
+
+        if shard_results is not None:
+            missing = [f.name for f in image_files if f.name not in shard_results]
+            if missing:
+                raise ValueError(f"No shard results for {len(missing)} source(s), e.g. {missing[0]}: "
+                                 f"sources changed after sharding, rerun the shards")
+
+        if not image_files and not entries:
             self.logger.error("❌ No image files found in screens directory")
             return {}
 
-        self.logger.info(f"📁 Found {len(image_files)} images to process")
-
-        # Step 1: Backup all original images
+        # Nothing new, changed or removed, and every output grouped: screens.json
+        # is current, so stop before any image library is even loaded
+        grouped = {m for group in manifest["groups"] for m in group["members"]}
+        if (shard_results is None and not image_files and len(entries) == known_entries
+                and grouped == {entry["output"] for entry in entries.values()}
+                and (self.screens_dir / "screens.json").exists()):
+            self.logger.info(f"✨ Nothing changed: {len(entries)} images in {len(manifest['groups'])} groups")
+            return self.screen_stats([screen for group in manifest["groups"] for screen in group["screens"]])
+
+        # Step 1: Backup original images on a background thread; content already
+        # in the store costs nothing, and cleaning starts right away
         self.logger.info("💾 Creating backup of original images...")
-        for img_file in image_files:
-            dst = self.backup_dir / img_file.name
-            shutil.copy2(img_file, dst)
-        self.logger.info(f"✅ Backup completed: {len(image_files)} files")
-
-        # Step 2: Process images in batches
-        all_processed_images = {}
+        backup = BackupStore(self.backup_dir)
+        io = PipelinedIO(backup, self.screens_dir / ".cache" / "staging",
+                         io_threads=self.io_threads, max_frames=self.prefetch, metrics=self.metrics)
+        io.backup_all(image_files)
+
+        # Status-bar profiles are fixed before cleaning so every worker agrees
+        if shard_results is None:
+            self.calibrate_device_profiles(image_files)
+
+        # Step 2: Process images in batches. Sources are decoded ahead on I/O
+        # threads and outputs written behind; frames are reduced to ImageRecords
+        # immediately, so memory does not grow with the capture size.
+        new_records: Dict[str, ImageRecord] = {}
         total_batches = (len(image_files) + self.batch_size - 1) // self.batch_size
+        existing_outputs = {entry["output"] for entry in entries.values()}
+
+        if self.frame_store is not None:
+            self.frame_store.clear()
+
+        pool = None
+        log_listener = None
+        if self.workers > 1 and image_files and shard_results is None:
+            pool, log_listener = self.start_pool()
 
-        for batch_idx in range(total_batches):
-            start_idx = batch_idx * self.batch_size
-            self.logger.info(f"🔄 Processing batch {batch_idx + 1}/{total_batches} "
-                           f"(images {start_idx + 1}-{min(start_idx + self.batch_size, len(image_files))})")
+        # Repeats of an earlier source in this run are matched before cleaning
+        # and reuse its output; run_records holds this run's records by source name
+        duplicates = NearDuplicateIndex() if self.dedup else None
+        run_records: Dict[str, ImageRecord] = {}
+        collapsed: List[Dict[str, str]] = []
 
-            # Load batch
-            batch_images = self.load_images_batch(image_files, start_idx, self.batch_size)
+        # Sources are signed on the I/O threads; the pool's are signed there, not decoded
+        sources = (io.prefetch(image_files, decode=pool is None,
+                               signature=self.source_signature if duplicates is not None else None)
+                   if shard_results is None and (pool is None or duplicates is not None) else None)
 
-            # Process batch
-            processed_batch = self.process_image_batch(batch_images)
+        try:
+            for batch_idx in range(total_batches):
+                start_idx = batch_idx * self.batch_size
+                self.logger.info(f"🔄 Processing batch {batch_idx + 1}/{total_batches} "
+                               f"(images {start_idx + 1}-{min(start_idx + self.batch_size, len(image_files))})")
+
+                batch_files = image_files[start_idx:start_idx + self.batch_size]
+                source_names: Dict[str, str] = {}
+
+                batch_records: Dict[str, ImageRecord] = {}
+                writes: Dict[str, Future] = {}
+                variant_writes: Dict[str, Future] = {}
+                source_hashes: Dict[str, str] = {}
+
+                if pool is not None or shard_results is not None:
+                    # Decode, clean, featurize and encode in worker processes (or shards)
+                    hashes = {img_file.name: io.source_hash(img_file) for img_file in batch_files}
+                    if shard_results is None and duplicates is None:
+                        batch_records, encoded_batch, variant_batch = self.process_files_parallel(
+                            pool, batch_files, taken=existing_outputs, source_names=source_names, reserved=reserved)
+                    else:
+                        if shard_results is None:
+                            results = self.clean_unique_files(pool, itertools.islice(sources, len(batch_files)),
+                                                              duplicates, run_records)
+                        else:
+                            results = (self.load_shard_result(*shard_results[img_file.name],
+                                                              hashes[img_file.name])
+                                       for img_file in batch_files)
+                            if duplicates is not None:
+                                results = self.collapse_duplicates(results, duplicates, run_records)
+                        batch_records, encoded_batch, variant_batch = self.assign_outputs(
+                            results, taken=existing_outputs, source_names=source_names, reserved=reserved)
+                    for filename, record in batch_records.items():
+                        if record.duplicate_of is not None:
+                            continue
+                        writes[filename] = io.write(self.screens_dir / filename,
+                                                    data=encoded_batch.get(filename) or b'')
+                        files = self.variant_files(filename, variant_batch.get(filename, {}))
+                        variant_writes[filename] = io.write_files(lambda files=files: files)
+                    source_hashes = {name: future.result() for name, future in hashes.items()}
+                else:
+                    for img_file, image, digest, signature in itertools.islice(sources, len(batch_files)):
+                        source_hashes[img_file.name] = digest
+                        if image is None:
+                            self.logger.warning(f"❌ Failed to load: {img_file.name}")
+                            continue
+                        self.logger.info(f"✅ Loaded: {img_file.name}")
+
+                        representative = None
+                        if duplicates is not None and signature is not None:
+                            representative = duplicates.match(img_file.name, signature)
+                        if representative is not None:
+                            records, _, _ = self.assign_outputs(
+                                [self.duplicate_result(img_file.name, representative, run_records)],
+                                taken=existing_outputs, source_names=source_names, reserved=reserved)
+                            batch_records.update(records)
+                            continue
+
+                        # Clean in this thread; encoding and writing happen behind it
+                        processed = self.process_image_batch(
+                            {img_file.name: image}, taken=existing_outputs, source_names=source_names,
+                            reserved=reserved)
+                        del image
+                        for filename, cleaned in processed.items():
+                            with self.metrics.image(img_file.name), self.metrics.stage("featurize"):
+                                batch_records[filename] = self.build_record(filename, cleaned, keep_frame=True)
+                            run_records[img_file.name] = batch_records[filename]
+                            writes[filename] = io.write(self.screens_dir / filename, image=cleaned,
+                                                        label=img_file.name)
+                            variant_writes[filename] = io.write_files(
+                                lambda filename=filename, cleaned=cleaned:
+                                    self.variant_files(filename, self.encode_variants(cleaned)),
+                                label=img_file.name)
+                        del processed
+
+                # Publish the batch's outputs and record them, so an interrupted
+                # run resumes here without mistaking half a batch for new sources;
+                # outputs are journalled as pending until they are recorded
+                manifest["pending"] = sorted(set(manifest.get("pending", [])) | set(batch_records))
+                self.save_manifest(manifest)
+                for filename, record in batch_records.items():
+                    if record.duplicate_of is not None:
+                        # Copy the representative's published output and variants
+                        representative = new_records[record.duplicate_of]
+                        writes[filename] = io.write(self.screens_dir / filename,
+                                                    data=(self.screens_dir / representative.filename).read_bytes())
+                        variant_writes[filename] = io.write_files(
+                            lambda filename=filename, representative=representative:
+                                self.variant_files(filename, self.output_variants(representative)))
+                        collapsed.append({"source": source_names[filename], "output": filename,
+                                          "representative": duplicates.collapsed[source_names[filename]],
+                                          "reused": representative.filename})
+                    record.variants = variant_writes[filename].result()
+                    new_records[filename] = record
+                    record.content_hash = io.commit(self.screens_dir / filename, writes[filename])
+                    self.run_outputs.add(filename)
+                    source_name = source_names[filename]
+                    entries[source_name] = {
+                        "hash": source_hashes[source_name],
+                        "output": filename,
+                        "output_hash": record.content_hash,
+                        **record.to_dict(),
+                    }
+
+                manifest["pending"] = [name for name in manifest["pending"] if name not in self.run_outputs]
+                self.save_manifest(manifest)
+                self.logger.info(f"✅ Batch {batch_idx + 1} completed: {len(batch_records)} images")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if log_listener is not None:
+                log_listener.stop()
+            io.close()
+
+        self.logger.info(f"✅ Backup completed: {len(image_files)} files "
+                         f"({backup.stored} stored, {len(image_files) - backup.stored} already backed up)")
+
+        if duplicates is not None:
+            self.save_duplicate_report(collapsed)
+
+        return self.finish_run(manifest, new_records)
+
+    def plan(self) -> Dict[str, List[str]]:
+        """
+        What process_all_images would do, without doing it: the sources it
+        would process, and the sources whose manifest entries it would drop
+        without reprocessing them (removed). Only reads the manifest and hashes
+        sources; nothing is decoded or written.
+        """
+        manifest = self.load_manifest()
+        entries = manifest["files"]
+        previous = set(entries)
+        process = [f.name for f in self.select_sources(entries, manifest.get("pending", ()))]
+        return {"process": process, "removed": sorted(previous - set(entries) - set(process))}
+
+    @staticmethod
+    def screen_stats(screens_data: List[Dict]) -> Dict[str, int]:
+        """Static and scrollable screen counts of screens.json data."""
+        stats = {"static": 0, "scrollable": 0}
+        for screen_data in screens_data:
+            stats[screen_data["type"]] += 1
+        return stats
 
-            # Save processed images
-            for filename, image in processed_batch.items():
-                output_path = self.screens_dir / filename
-                cv2.imwrite(str(output_path), image)
-                all_processed_images[filename] = image
+    def shard_dir(self, index: int, count: int) -> Path:
+        """Where shard index of count leaves its results for merge_shards."""
+        return self.screens_dir / ".cache" / "shards" / f"{index}-of-{count}"
 
-            self.logger.info(f"✅ Batch {batch_idx + 1} completed: {len(processed_batch)} images")
+    def process_shard(self, index: int, count: int) -> int:
+        """
+        Clean, featurize and encode one shard's slice of the work, for
+        merge_shards to assemble. The work list is the one a single-node run
+        would process (see select_sources); shard index takes every count-th
+        file of it, starting at index. Encoded outputs, variants, records and
+        descriptors go to shard_dir(index, count) only: outputs, manifest and
+        backup are left to the merge, and output names are assigned there,
+        because duplicate suffixes depend on every shard's results.
+
+        Shards can run on other machines with a copy of the screens directory
+        (including .cache), or as N processes on one box. Returns the number of
+        files in the slice.
+        """
+        manifest = self.load_manifest()
+        image_files = self.select_sources(manifest["files"], manifest.get("pending", ()))
+        # Every shard calibrates on the global work list, so all clean alike
+        self.calibrate_device_profiles(image_files)
+        shard_files = image_files[index::count]
+
+        shard_dir = self.shard_dir(index, count)
+        shutil.rmtree(shard_dir, ignore_errors=True)
+        (shard_dir / "outputs").mkdir(parents=True)
+        # Descriptors travel with the shard's results (pool workers use them too)
+        self.cache_dir = str(shard_dir / "features")
+        self.feature_cache = FeatureCache(Path(self.cache_dir), {**self.orb_params, "proxy": self.proxy_width})
+        self.logger.info(f"🧩 Shard {index}/{count}: {len(shard_files)} of {len(image_files)} images")
+
+        pool = None
+        log_listener = None
+        if self.workers > 1 and shard_files:
+            pool, log_listener = self.start_pool()
+
+        results = []
+        try:
+            for img_file, (name, record, encoded, variants, success) in zip(
+                    shard_files, self.clean_files(pool, shard_files)):
+                result = {"source": name, "hash": self.file_hash(img_file), "success": success,
+                          "record": None, "encoded": encoded is not None, "variants": list(variants)}
+                if record is not None:
+                    result["record"] = record.to_dict()
+                    result["inpaint_report"] = record.inpaint_report
+                if record is not None and record.signature is not None:
+                    # Near-duplicates are matched across shards at merge time
+                    digest, thumbnail = record.signature
+                    result["signature"] = {"hash": digest, "shape": list(thumbnail.shape),
+                                           "thumbnail": base64.b64encode(thumbnail.tobytes()).decode("ascii")}
+                if encoded is not None:
+                    (shard_dir / "outputs" / name).write_bytes(encoded)
+                if variants:
+                    variant_dir = shard_dir / "variants" / name
+                    variant_dir.mkdir(parents=True, exist_ok=True)
+                    for key, data in variants.items():
+                        (variant_dir / key).write_bytes(data)
+                results.append(result)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if log_listener is not None:
+                log_listener.stop()
+
+        # Written last: a shard without results.json did not finish
+        with open(shard_dir / "results.json", 'w', encoding='utf-8') as f:
+            json.dump({"index": index, "count": count, "params": self.manifest_params(), "files": results},
+                      f, indent=2, ensure_ascii=False)
+        self.logger.info(f"✅ Shard {index}/{count} completed: {len(results)} images in {shard_dir}")
+        return len(results)
+
+    def load_shard_result(self, index: int, count: int, result: Dict, source_hash: Future
+                          ) -> Tuple[str, Optional["ImageRecord"], Optional[bytes], Dict[str, bytes], bool]:
+        """
+        One shard result as clean_image_file returned it, after checking that the
+        source has not changed since. Its descriptors join the feature cache.
+        """
+        name = result["source"]
+        if source_hash.result() != result["hash"]:
+            raise ValueError(f"{name} changed after shard {index}/{count} processed it, rerun the shard")
+        if result["record"] is None:
+            self.logger.warning(f"❌ Failed to load: {name}")
+            return name, None, None, {}, False
+
+        shard_dir = self.shard_dir(index, count)
+        record = ImageRecord.from_dict(name, result["record"])
+        record.inpaint_report = result.get("inpaint_report")
+        if result.get("signature"):
+            signature = result["signature"]
+            thumbnail = np.frombuffer(base64.b64decode(signature["thumbnail"]), dtype=np.uint8)
+            record.signature = (signature["hash"], thumbnail.reshape(signature["shape"]))
+        shard_cache = FeatureCache(shard_dir / "features", {**self.orb_params, "proxy": self.proxy_width})
+        cached = shard_cache.get(record.feature_key)
+        if cached is not None and self.feature_cache.get(record.feature_key) is None:
+            self.feature_cache.put(record.feature_key, *cached)
+
+        encoded = (shard_dir / "outputs" / name).read_bytes() if result["encoded"] else None
+        variants = {key: (shard_dir / "variants" / name / key).read_bytes() for key in result["variants"]}
+        return name, record, encoded, variants, result["success"]
+
+    def merge_shards(self, count: int) -> Dict[str, int]:
+        """
+        Assemble the results of shards 0..count-1 (see process_shard) into the
+        same outputs, manifest, backup, groups and screens.json a single-node
+        run would produce: results are taken in global order, so output names,
+        grouping and classification match exactly. Shard directories are
+        removed afterwards.
+        """
+        results: Dict[str, Tuple[int, int, Dict]] = {}
+        for index in range(count):
+            path = self.shard_dir(index, count) / "results.json"
+            if not path.exists():
+                raise FileNotFoundError(f"Shard {index}/{count} has not finished: no {path}")
+            with open(path, 'r', encoding='utf-8') as f:
+                shard = json.load(f)
+            if shard["params"] != self.manifest_params():
+                raise ValueError(f"Shard {index}/{count} was processed with different parameters")
+            for result in shard["files"]:
+                results[result["source"]] = (index, count, result)
+
+        self.logger.info(f"🧩 Merging {count} shards ({len(results)} images)")
+        stats = self.process_all_images(shard_results=results)
+        for index in range(count):
+            shutil.rmtree(self.shard_dir(index, count), ignore_errors=True)
+        return stats
 
-        # Step 3: Group all processed images
+    def finish_run(self, manifest: Dict, new_records: Dict[str, "ImageRecord"]) -> Dict[str, int]:
+        """
+        Group, classify and write screens.json once every new output is recorded
+        in the manifest (new_records holds this run's, by output filename).
+        """
+        entries: Dict[str, Dict] = manifest["files"]
+
+        # Step 3: Group images. Groups containing changed or removed outputs are
+        # dissolved and their surviving members regrouped with the new images.
         self.logger.info("🔗 Grouping related images using feature matching...")
-        groups = self.group_related_images(all_processed_images)
-        self.logger.info(f"📊 Created {len(groups)} groups from {len(all_processed_images)} images")
+        valid_outputs = {entry["output"]: entry for entry in entries.values()}
+        kept_groups = []
+        pending = {}
+
+        records = {output: ImageRecord.from_dict(output, entry) for output, entry in valid_outputs.items()}
+        records.update(new_records)
+
+        for group in manifest["groups"]:
+            members = group["members"]
+            if all(m in valid_outputs and m not in new_records for m in members):
+                kept_groups.append(group)
+            else:
+                for m in members:
+                    if m in valid_outputs and m not in new_records:
+                        pending[m] = records[m]
+
+        grouped = {m for group in kept_groups for m in group["members"]}
+        for output in valid_outputs:
+            if output not in grouped and output not in new_records:
+                # Processed before an interruption but never grouped
+                pending[output] = records[output]
+
+        pending.update(new_records)
+
+        groups = {group["name"]: list(group["members"]) for group in kept_groups}
+        seed_records = {group["name"]: records[group["members"][0]] for group in kept_groups}
+        with self.metrics.stage("group"):
+            groups = self.extend_groups(groups, seed_records, pending)
+
+        if self.inpaint_reports:
+            self.save_inpaint_report()
+
+        if self.recall_report and pending:
+            report = self.candidate_recall_report(pending)
+            with open(self.screens_dir / ".cache" / "recall_report.json", 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+
+        if self.validate_proxies and pending:
+            report = self.proxy_validation_report(pending)
+            with open(self.screens_dir / ".cache" / "proxy_validation.json", 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+
+        touched = {name for name, members in groups.items()
+                   if any(m in pending for m in members)}
+        self.logger.info(f"📊 {len(groups)} groups, {len(touched)} new or updated "
+                         f"from {len(pending)} pending images")
+        self.logger.info(f"🗄️ Feature cache: {self.feature_cache.hits} hits, "
+                         f"{self.feature_cache.misses} misses")
 
         # Step 4: Generate screens.json
         self.logger.info("📝 Generating screens.json...")
+        screens_by_group = {group["name"]: group["screens"] for group in kept_groups}
+        new_groups = []
         screens_data = []
-        stats = {"static": 0, "scrollable": 0}
 
-        for group_name, filenames in groups.items():
-            group_size = len(filenames)
-
-            if group_size == 1:
-                # Single static screen
-                filename = filenames[0]
-                screen_data = {
-                    "src": f"assets/screens/{filename}",
-                    "id": Path(filename).stem,
-                    "type": "static"
-                }
-                screens_data.append(screen_data)
-                stats["static"] += 1
-                self.logger.info(f"  📄 Static: {filename}")
+        # Classify touched groups (and kept groups from manifests without a
+        # decision) in one batch, from the records alone
+        decisions = {group["name"]: group["classification"] for group in kept_groups
+                     if "classification" in group}
+        with self.metrics.stage("classify"):
+            decisions.update(self.classify_groups(
+                {name: members for name, members in groups.items()
+                 if name in touched or name not in decisions}, records))
+        self.save_classification_report(decisions)
 
+        for group_name, filenames in groups.items():
+            if group_name in touched:
+                screens = self.build_group_screens(group_name, filenames, records, decisions[group_name])
             else:
-                # Multiple images - analyze for scrollable
-                sample_image = all_processed_images[filenames[0]]
-                other_images = [all_processed_images[f] for f in filenames[1:]]
-
-                is_scrollable = self.is_scrollable_screen(sample_image, other_images, group_size)
-
-                if is_scrollable:
-                    screen_data = {
-                        "src": f"assets/screens/{filenames[0]}",
-                        "id": group_name,
-                        "type": "scrollable",
-                        "images": [f"assets/screens/{f}" for f in filenames],
-                        "pinnedHeaderHeight": "15%"
-                    }
-                    stats["scrollable"] += 1
-                    self.logger.info(f"  📜 Scrollable: {group_name} ({group_size} images)")
-                else:
-                    # Multiple static screens
-                    for filename in filenames:
-                        screen_data = {
-                            "src": f"assets/screens/{filename}",
-                            "id": f"{group_name}_{Path(filename).stem}",
-                            "type": "static"
-                        }
-                        screens_data.append(screen_data)
-                        stats["static"] += 1
-                    self.logger.info(f"  📄 Multiple static: {group_name} ({group_size} images)")
-
-        # Save screens.json
+                screens = screens_by_group[group_name]
+
+            new_groups.append({"name": group_name, "members": filenames, "screens": screens,
+                               "classification": decisions[group_name]})
+            screens_data.extend(screens)
+
+        stats = self.screen_stats(screens_data)
+
+        # Save screens.json atomically; the app (or a dev server) may read it at any time
         screens_json_path = self.screens_dir / "screens.json"
-        with open(screens_json_path, 'w', encoding='utf-8') as f:
+        tmp_path = screens_json_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             json.dump(screens_data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, screens_json_path)
+
+        removed = self.prune_generated(screens_data)
+        if removed:
+            self.logger.info(f"🧹 Removed {removed} generated files screens.json no longer refers to")
+
+        manifest["groups"] = new_groups
+        self.save_manifest(manifest)
+        if self.frame_store is not None:
+            self.frame_store.clear()
+
+        if self.metrics.enabled:
+            summary = self.metrics.save(self.screens_dir / ".cache" / "metrics.json")
+            for name, totals in summary["stages"].items():
+                self.logger.info(f"⏱️ {name}: {totals['calls']} calls, {totals['wall_ms']:.0f}ms wall, "
+                                 f"{totals['cpu_ms']:.0f}ms CPU, peak {totals['peak_kb']:.0f}KB")
 
         self.logger.info("✅ Processing complete!")
         self.logger.info(f"📊 Generated {len(screens_data)} screen configurations")
@@ -534,15 +3227,380 @@ class EnhancedImageProcessor:
 
         return stats
 
-def main():
+    def source_snapshot(self) -> Dict[str, Tuple[int, int]]:
+        """(size, mtime) of every image file in the screens directory."""
+        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp'}
+        snapshot = {}
+        for f in self.screens_dir.iterdir():
+            if f.suffix.lower() in image_extensions:
+                try:
+                    stat = f.stat()
+                except FileNotFoundError:
+                    continue
+                if f.is_file():
+                    snapshot[f.name] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def watch_baseline(self) -> Dict[str, Tuple[int, int]]:
+        """
+        source_snapshot as the last run saw it (before selecting sources), plus
+        the outputs it wrote. Anything else that differs from it changed during
+        or after that run and still needs processing.
+        """
+        baseline = dict(self.run_snapshot)
+        for name in self.run_outputs:
+            try:
+                stat = (self.screens_dir / name).stat()
+            except FileNotFoundError:
+                baseline.pop(name, None)
+                continue
+            baseline[name] = (stat.st_size, stat.st_mtime_ns)
+        return baseline
+
+    def watch(self, interval: float = 1.0, settle: float = 0.3) -> None:
+        """
+        Keep processing the screens directory as screenshots arrive, until
+        interrupted.
+
+        The directory is polled every `interval` seconds. Once files have been
+        added, changed or removed and have stopped changing for `settle`
+        seconds (so half-copied files are not picked up), an incremental run
+        processes only them. This processor stays alive between runs, so ORB,
+        the feature cache, pairwise similarities, device profiles and file
+        hashes stay warm; new screens join an existing group or start one, only
+        touched groups are reclassified, and screens.json is replaced
+        atomically. A failed run is logged and retried on the next change.
+        Files that arrive while a run is in progress are picked up by the next.
+        """
+        self.logger.info(f"👀 Watching {self.screens_dir} for new screenshots (Ctrl+C to stop)")
+        self.process_all_images()
+        # Later runs only pick up what changed, whatever the first one did
+        self.incremental = True
+        snapshot = self.watch_baseline()
+
+        try:
+            while True:
+                time.sleep(interval)
+                current = self.source_snapshot()
+                if current == snapshot:
+                    continue
+
+                while True:
+                    time.sleep(settle)
+                    settled = self.source_snapshot()
+                    if settled == current:
+                        break
+                    current = settled
+
+                changed = sorted(name for name in current.keys() | snapshot.keys()
+                                 if current.get(name) != snapshot.get(name))
+                self.logger.info(f"📥 {len(changed)} file(s) changed: {', '.join(changed[:5])}"
+                                 f"{' ...' if len(changed) > 5 else ''}")
+                started = time.perf_counter()
+                self.inpaint_reports = {}
+                try:
+                    self.process_all_images()
+                except Exception as e:
+                    self.logger.error(f"❌ Watch run failed: {e}")
+                self.logger.info(f"⏱️ Updated in {time.perf_counter() - started:.2f}s")
+                snapshot = self.watch_baseline()
+        except KeyboardInterrupt:
+            self.logger.info("👋 Stopped watching")
+
+    def process_in_memory(self, images: Mapping[str, Union[bytes, np.ndarray]]) -> Iterator[Dict]:
+        """
+        Clean, group and classify screenshots held in memory (encoded file bytes
+        or decoded BGR frames, keyed by file name, in input order) without
+        touching the screens directory: no backup, manifest, caches or output
+        files. Needs a processor created with in_memory=True; runs in this
+        process whatever the worker count.
+
+        Yields each decision as it is made:
+        - {"type": "image", "source", "output", "data", "files", "duplicate_of",
+          "inpaint_report"} per decodable input: the output's encoded bytes and
+          its responsive variants (files, keyed by path relative to the screens
+          directory, as are all files below);
+        - {"type": "group", "name", "members", "screens", "classification",
+          "files"} per group: its screens.json entries, classify_group decision
+          and stitched tiles;
+        - finally {"type": "screens", "screens", "stats"}: the screens.json data.
+        """
+        if not self.in_memory:
+            raise ValueError("process_in_memory needs a processor created with in_memory=True")
+
+        def decode(data: Union[bytes, np.ndarray]) -> Optional[np.ndarray]:
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            return data
+
+        names = list(images)
+        if self.device_profiles is not None:
+            self.train_device_profiles((name, decode(images[name]))
+                                       for name in names[:self.device_profiles.confirmations * 2])
+
+        duplicates = NearDuplicateIndex() if self.dedup else None
+        run_records: Dict[str, ImageRecord] = {}
+        encoded_outputs: Dict[str, Tuple[Optional[bytes], Dict[str, bytes]]] = {}
+        records: Dict[str, ImageRecord] = {}
+        for name in names:
+            image = decode(images[name])
+            if image is None:
+                self.logger.warning(f"❌ Failed to load: {name}")
+                continue
+
+            with self.metrics.image(name):
+                representative = None
+                if duplicates is not None:
+                    # Encoded inputs are signed exactly like files on disk
+                    source = images[name]
+                    if isinstance(source, (bytes, bytearray, memoryview)):
+                        with self.metrics.stage("dedup"):
+                            signature = self.source_signature(source)
+                    else:
+                        signature = self.content_signature(image)
+                    if signature is not None:
+                        representative = duplicates.match(name, signature)
+                if representative is not None:
+                    _, record, _, _, success = self.duplicate_result(name, representative, run_records)
+                    encoded, variants = encoded_outputs[representative]
+                else:
+                    record, encoded, variants, success = self.clean_frame(name, image)
+                    run_records[name] = record
+                    encoded_outputs[name] = (encoded, variants)
+            del image
+
+            record.filename = self.unique_output_filename(name, records) if success else name
+            files = {path.relative_to(self.screens_dir).as_posix(): data
+                     for path, data in self.variant_files(record.filename, variants).items()}
+            record.variants = [Path(path).name for path in files]
+            record.content_hash = hashlib.sha1(encoded).hexdigest() if encoded is not None else ""
+            records[record.filename] = record
+            yield {"type": "image", "source": name, "output": record.filename, "data": encoded, "files": files,
+                   "duplicate_of": representative, "inpaint_report": record.inpaint_report}
+
+        screens_data = []
+        groups = self.group_records(records)
+        decisions = self.classify_groups(groups, records)
+        for group_name, filenames in groups.items():
+            screens = self.build_group_screens(group_name, filenames, records, decisions[group_name])
+            files = dict(self.memory_files)
+            self.memory_files.clear()
+            screens_data.extend(screens)
+            yield {"type": "group", "name": group_name, "members": filenames, "screens": screens,
+                   "classification": decisions[group_name], "files": files}
+
+        self.frame_store.clear()
+        yield {"type": "screens", "screens": screens_data, "stats": self.screen_stats(screens_data)}
+
+
+def process_screenshots(images: Mapping[str, Union[bytes, np.ndarray]], **settings) -> Iterator[Dict]:
+    """
+    Library entry point: stream the pipeline's per-image results and group
+    decisions for screenshots held in memory, without writing any file (see
+    EnhancedImageProcessor.process_in_memory). settings are
+    EnhancedImageProcessor arguments.
+    """
+    return EnhancedImageProcessor(in_memory=True, **settings).process_in_memory(images)
+
+
+def build_screens(images: Mapping[str, Union[bytes, np.ndarray]], **settings) -> List[Dict]:
+    """screens.json data for screenshots held in memory (generated files are discarded)."""
+    screens: List[Dict] = []
+    for event in process_screenshots(images, **settings):
+        if event["type"] == "screens":
+            screens = event["screens"]
+    return screens
+
+
+def configure_logging(log_file: Optional[Path] = None, level: int = logging.INFO) -> None:
+    """
+    The CLI's logging: records are queued and written by a listener thread, so
+    per-image log lines never wait on the log file or the console. Left alone
+    if the application has already configured the root logger.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    if log_file is not None:
+        handlers.insert(0, logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+
+COMMANDS = ("process", "watch", "shard", "merge", "restore")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Command-line interface: one subcommand per mode, "process" when none is given."""
+    paths = argparse.ArgumentParser(add_help=False)
+    paths.add_argument("--screens-dir", default="src/assets/screens",
+                       help="Screenshots to process; outputs, backup and caches go here too "
+                            "(default: src/assets/screens)")
+
+    pipeline = argparse.ArgumentParser(add_help=False, parents=[paths])
+    pipeline.add_argument("--batch-size", type=int, default=15,
+                          help="Images cleaned and recorded in the manifest per batch (default: 15)")
+    pipeline.add_argument("--cache-dir",
+                          help="Feature cache directory (default: <screens-dir>/.cache/features)")
+    pipeline.add_argument("--workers", type=int, default=1,
+                          help="Number of worker processes for decode/inpaint/encode (default: 1)")
+    pipeline.add_argument("--io-threads", type=int, default=2,
+                          help="Threads for background backup, decode, encode and write (default: 2)")
+    pipeline.add_argument("--prefetch", type=int, default=4,
+                          help="Decoded frames, and pending writes, allowed ahead of cleaning (default: 4)")
+    pipeline.add_argument("--full", action="store_true",
+                          help="Ignore the processing manifest and reprocess every image")
+    pipeline.add_argument("--candidates", type=int, default=16,
+                          help="Grouping candidates proposed per screen by the index, 0 = exhaustive "
+                               "(default: 16)")
+    pipeline.add_argument("--profile-confirmations", type=int, default=3,
+                          help="Agreeing detections before a device status-bar profile is reused, "
+                               "0 = always detect (default: 3)")
+    pipeline.add_argument("--inpaint-strategy", choices=["auto", "flat", "ns", "telea"], default="auto",
+                          help="Status-bar cleaning tier: auto = flat fill on uniform backgrounds, "
+                               "TELEA otherwise (default: auto)")
+    pipeline.add_argument("--recall-report", action="store_true",
+                          help="Compare indexed grouping against exhaustive matching and save a report")
+    pipeline.add_argument("--proxy-width", type=int, default=360,
+                          help="Minimum width of the pyramid proxies used for grouping and "
+                               "classification, 0 = full resolution (default: 360)")
+    pipeline.add_argument("--validate-proxies", action="store_true",
+                          help="Compare proxy grouping/classification against full resolution and save a report")
+    pipeline.add_argument("--variant-widths", default="360,720",
+                          help="Comma-separated widths of the responsive outputs; each screen is "
+                               "also encoded at its own width (default: 360,720)")
+    pipeline.add_argument("--variant-formats", default="avif,webp,jpg",
+                          help="Comma-separated responsive formats in preference order, "
+                               "empty to disable (default: avif,webp,jpg)")
+    pipeline.add_argument("--no-stitch", action="store_true",
+                          help="Do not stitch scrollable groups into one long image")
+    pipeline.add_argument("--stitch-tile-height", type=int, default=4096,
+                          help="Maximum height of each stitched tile in pixels (default: 4096)")
+    pipeline.add_argument("--frame-store", action="store_true",
+                          help="Keep this run's cleaned frames and proxies in memory-mapped files under "
+                               ".cache/frames, so stitching and descriptor reloads skip decoding outputs")
+    pipeline.add_argument("--no-dedup", action="store_true",
+                          help="Clean every screenshot, even near-exact repeats of another one in the run "
+                               "(collapsed repeats are listed in .cache/duplicates.json)")
+    pipeline.add_argument("--metrics", action="store_true",
+                          help="Record wall/CPU time and peak memory per stage and image "
+                               "to .cache/metrics.json and .cache/metrics.csv")
+
+    parser = argparse.ArgumentParser(description="Screenshot-to-PWA image processor")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    process = commands.add_parser("process", parents=[pipeline],
+                                  help="Process new and changed screenshots (the default command)")
+    process.add_argument("--dry-run", action="store_true",
+                         help="List the screenshots that would be processed or dropped, without "
+                              "decoding or writing anything")
+    process.add_argument("--profile", metavar="PATH",
+                         help="Run under cProfile and dump the stats to PATH (view with python -m pstats)")
+    watch = commands.add_parser("watch", parents=[pipeline],
+                                help="Keep running and process screenshots as they are added")
+    watch.add_argument("--interval", type=float, default=1.0,
+                       help="Seconds between directory polls (default: 1.0)")
+    shard = commands.add_parser("shard", parents=[pipeline],
+                                help="Clean and featurize only shard I of N of the work into .cache/shards/, "
+                                     "for a later merge N")
+    shard.add_argument("shard", metavar="I/N")
+    merge = commands.add_parser("merge", parents=[pipeline],
+                                help="Assemble the results of shards 0..N-1 into outputs and screens.json, "
+                                     "as a single run would")
+    merge.add_argument("count", type=int, metavar="N")
+    commands.add_parser("restore", parents=[paths],
+                        help="Copy the backed-up originals back into the screens directory")
+    return parser
+
+
+def processor_settings(args: argparse.Namespace) -> Dict:
+    """EnhancedImageProcessor arguments from the parsed pipeline options."""
+    return {
+        "screens_dir": args.screens_dir,
+        "batch_size": args.batch_size,
+        "cache_dir": args.cache_dir,
+        "workers": args.workers,
+        "io_threads": args.io_threads,
+        "prefetch": args.prefetch,
+        "incremental": not args.full,
+        "candidate_k": args.candidates,
+        "recall_report": args.recall_report,
+        "profile_confirmations": args.profile_confirmations,
+        "inpaint_strategy": args.inpaint_strategy,
+        "metrics": args.metrics,
+        "proxy_width": args.proxy_width,
+        "validate_proxies": args.validate_proxies,
+        "variant_widths": tuple(int(w) for w in args.variant_widths.split(",") if w),
+        "variant_formats": tuple(f for f in args.variant_formats.split(",") if f),
+        "stitch": not args.no_stitch,
+        "stitch_tile_height": args.stitch_tile_height,
+        "frame_store": args.frame_store,
+        "dedup": not args.no_dedup,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
     """Main entry point with enhanced processing."""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in (*COMMANDS, "-h", "--help"):
+        argv = ["process", *argv]
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    screens_dir = Path(args.screens_dir)
+    if args.command == "shard":
+        index, count = (int(part) for part in args.shard.split("/"))
+        if not 0 <= index < count:
+            parser.error("shard expects I/N with 0 <= I < N")
+
+    if args.command == "restore":
+        configure_logging(screens_dir / "processing.log")
+        restored = EnhancedImageProcessor(str(screens_dir)).restore_originals()
+        print(f"♻️ Restored {len(restored)} original images")
+        return
+
+    if args.command == "process" and args.dry_run:
+        # Console only: a dry run leaves the screens directory untouched
+        configure_logging()
+        plan = EnhancedImageProcessor(**processor_settings(args)).plan()
+        for name in plan["process"]:
+            print(f"process  {name}")
+        for name in plan["removed"]:
+            print(f"remove   {name}")
+        print(f"🔎 {len(plan['process'])} to process, {len(plan['removed'])} to remove")
+        return
+
+    configure_logging(screens_dir / "processing.log")
     print("🎯 Enhanced Screenshot-to-PWA Prototype Framework - Automated Image Processor")
     print("=" * 80)
 
     start_time = time.time()
 
-    processor = EnhancedImageProcessor(batch_size=15)  # Process 15 images at a time
-    stats = processor.process_all_images()
+    processor = EnhancedImageProcessor(**processor_settings(args))
+    if args.command == "watch":
+        processor.watch(interval=args.interval)
+        return
+    if args.command == "shard":
+        processor.process_shard(index, count)
+        return
+    if args.command == "merge":
+        stats = processor.merge_shards(args.count)
+    elif args.profile:
+        # cProfile only sees this process; with --workers N > 1 use a sampling
+        # profiler instead, e.g. py-spy record --subprocesses -- python scripts/process_images.py
+        profiler = cProfile.Profile()
+        stats = profiler.runcall(processor.process_all_images)
+        profiler.dump_stats(args.profile)
+        print(f"🔬 Profile saved to: {args.profile}")
+    else:
+        stats = processor.process_all_images()
 
     elapsed_time = time.time() - start_time
     print(f"\n⏱️ Processing completed in {elapsed_time:.1f} seconds")
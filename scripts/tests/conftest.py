@@ -0,0 +1,37 @@
+"""
+Shared fixtures for the image pipeline tests.
+
+Usage:
+    python -m pytest scripts/tests
+"""
+
+import sys
+import shutil
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmark_images import generate_corpus  # noqa: E402
+from process_images import EnhancedImageProcessor  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def corpus(tmp_path_factory) -> Path:
+    """A small synthetic capture (statics, scrollable sequences and retakes), shared read-only."""
+    return generate_corpus(tmp_path_factory.mktemp("corpus"), 16, seed=3, width=270, height=585)
+
+
+@pytest.fixture
+def screens_dir(corpus: Path, tmp_path: Path) -> Path:
+    """A fresh screens directory holding a copy of the corpus."""
+    target = tmp_path / "screens"
+    target.mkdir()
+    for path in sorted(corpus.glob("*.png")):
+        shutil.copy2(path, target / path.name)
+    return target
+
+
+def make_processor(screens_dir: Path, **settings) -> EnhancedImageProcessor:
+    """A processor for screens_dir that only writes JPEG variants, to keep runs short."""
+    return EnhancedImageProcessor(str(screens_dir), variant_formats=("jpg",), **settings)
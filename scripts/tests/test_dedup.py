@@ -0,0 +1,53 @@
+"""Near-duplicate collapsing: retakes of a screen reuse one output."""
+
+import json
+import shutil
+
+import numpy as np
+import pytest
+
+from benchmark_images import generate_corpus
+from conftest import make_processor
+from process_images import NearDuplicateIndex
+
+
+@pytest.fixture
+def retake_dir(tmp_path_factory, tmp_path):
+    """The benchmark's 30-image corpus at full size, where detected status bands vary between retakes."""
+    corpus = generate_corpus(tmp_path_factory.mktemp("retakes"), 30, seed=3)
+    for path in sorted(corpus.glob("*.png")):
+        shutil.copy2(path, tmp_path / path.name)
+    return tmp_path
+
+
+def screen_of(name: str) -> str:
+    """Generator screen a corpus file belongs to (e.g. duplicate4 for duplicate4_20250315_1_...)."""
+    return name.split("_")[0]
+
+
+def test_corpus_retakes_collapse(retake_dir):
+    names = sorted(path.name for path in retake_dir.glob("*.png"))
+    retakes = {}
+    for name in names:
+        if name.startswith("duplicate"):
+            retakes.setdefault(screen_of(name), []).append(name)
+
+    make_processor(retake_dir).process_all_images()
+
+    collapsed = json.loads((retake_dir / ".cache" / "duplicates.json").read_text())["collapsed"]
+    assert all(screen_of(entry["source"]) == screen_of(entry["representative"]) for entry in collapsed)
+    assert sorted(entry["source"] for entry in collapsed) == sorted(
+        name for frames in retakes.values() for name in frames[1:])
+
+
+def test_match_finds_representatives_past_the_first_block():
+    rng = np.random.default_rng(0)
+    index = NearDuplicateIndex()
+    signatures = [(int(rng.integers(0, 2 ** 63)), rng.integers(0, 256, (120, 64), dtype=np.uint8))
+                  for _ in range(200)]
+    for i, signature in enumerate(signatures):
+        assert index.match(f"screen{i}", signature) is None
+
+    digest, thumbnail = signatures[150]
+    retake = (digest ^ 0b101, np.clip(thumbnail.astype(np.int16) + 3, 0, 255).astype(np.uint8))
+    assert index.match("retake", retake) == "screen150"
@@ -0,0 +1,50 @@
+"""A capture processed serially, by a worker pool, or as shards plus a merge gives the same files."""
+
+import sys
+import shutil
+import hashlib
+import subprocess
+from pathlib import Path
+from typing import Dict
+
+SCRIPT = Path(__file__).resolve().parent.parent / "process_images.py"
+
+
+def run(screens_dir: Path, *args: str) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, str(SCRIPT), *args, "--screens-dir", str(screens_dir),
+                             "--variant-formats", "jpg"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait(*procs: subprocess.Popen) -> None:
+    for proc in procs:
+        assert proc.wait() == 0
+
+
+def snapshot(screens_dir: Path) -> Dict[str, str]:
+    """SHA-1 of every file the run published: outputs, variants, stitched tiles and screens.json."""
+    return {path.relative_to(screens_dir).as_posix(): hashlib.sha1(path.read_bytes()).hexdigest()
+            for path in sorted(screens_dir.rglob("*"))
+            if path.is_file()
+            and path.relative_to(screens_dir).parts[0] not in ("backup", ".cache", "processing.log")}
+
+
+def test_serial_pool_and_shards_publish_identical_files(corpus, tmp_path):
+    dirs = {}
+    for mode in ("serial", "workers", "sharded"):
+        dirs[mode] = tmp_path / mode
+        dirs[mode].mkdir()
+        for path in sorted(corpus.glob("*.png")):
+            shutil.copy2(path, dirs[mode] / path.name)
+
+    wait(run(dirs["serial"], "process"))
+    wait(run(dirs["workers"], "process", "--workers", "2"))
+    # Shards run as concurrent processes on this box, then merge
+    wait(run(dirs["sharded"], "shard", "0/2"), run(dirs["sharded"], "shard", "1/2"))
+    wait(run(dirs["sharded"], "merge", "2"))
+
+    serial = snapshot(dirs["serial"])
+    assert "screens.json" in serial
+    assert any(name.startswith("stitched/") for name in serial)
+    assert snapshot(dirs["workers"]) == serial
+    assert snapshot(dirs["sharded"]) == serial
@@ -0,0 +1,56 @@
+"""Incremental runs: which files select_sources queues, and what happens to outputs on disk."""
+
+import json
+import hashlib
+from pathlib import Path
+
+import cv2
+
+from conftest import make_processor
+from process_images import BackupStore
+
+
+def sha1(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+def manifest_files(screens_dir: Path) -> dict:
+    return json.loads((screens_dir / ".cache" / "manifest.json").read_text())["files"]
+
+
+def test_file_dropped_over_an_output_is_kept_as_a_new_source(screens_dir):
+    make_processor(screens_dir).process_all_images()
+    source, entry = next((name, entry) for name, entry in sorted(manifest_files(screens_dir).items())
+                         if entry["output"] != name)
+    output = screens_dir / entry["output"]
+
+    # A new screenshot that happens to carry an existing output's name
+    image = cv2.imread(str(output))
+    cv2.putText(image, "NEW", (40, 200), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 255), 4)
+    cv2.imwrite(str(output), image)
+    dropped = sha1(output)
+
+    assert set(make_processor(screens_dir).plan()["process"]) == {output.name, source}
+    make_processor(screens_dir).process_all_images()
+
+    files = manifest_files(screens_dir)
+    assert files[output.name]["hash"] == dropped
+    assert files[output.name]["output"] == output.name
+    assert files[source]["output"] != output.name
+    assert (screens_dir / files[source]["output"]).exists()
+    assert BackupStore(screens_dir / "backup").files[output.name]["hash"] == dropped
+    assert make_processor(screens_dir).plan()["process"] == []
+
+
+def test_deleted_output_is_rebuilt_from_its_source(screens_dir):
+    make_processor(screens_dir).process_all_images()
+    source, entry = sorted(manifest_files(screens_dir).items())[0]
+    output = screens_dir / entry["output"]
+    output.unlink()
+
+    assert make_processor(screens_dir).plan()["process"] == [source]
+    make_processor(screens_dir).process_all_images()
+
+    assert manifest_files(screens_dir)[source]["output"] == output.name
+    assert sha1(output) == entry["output_hash"]
+    assert make_processor(screens_dir).plan()["process"] == []
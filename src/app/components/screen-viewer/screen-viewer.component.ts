@@ -1,7 +1,7 @@
 import { Component, Input, Output, EventEmitter, OnChanges, SimpleChanges } from '@angular/core';
 import { CommonModule } from '@angular/common';
 import { IonContent } from '@ionic/angular/standalone';
-import { Screen } from '../../services/screens.service';
+import { ImageMeta, Screen, StitchedImage, StitchedTile } from '../../services/screens.service';
 
 @Component({
   selector: 'app-screen-viewer',
@@ -14,6 +14,8 @@ export class ScreenViewerComponent implements OnChanges {
   @Input() currentScreen: Screen | null = null;
   @Input() isScrollableScreen = false;
   @Input() scrollableContentHeight = 0;
+  /** Độ rộng hiển thị của ảnh, dùng cho thuộc tính sizes của các <source> */
+  @Input() imageSizes = '100vw';
 
   @Output() imageError = new EventEmitter<Event>();
 
@@ -31,4 +33,31 @@ export class ScreenViewerComponent implements OnChanges {
   trackByImageSrc(index: number, src: string): string {
     return src;
   }
+
+  trackByTile(index: number, tile: StitchedTile): string {
+    return tile.src;
+  }
+
+  /**
+   * Kéo ảnh ghép lên dưới header ghim để phần header trong ảnh không bị lặp lại.
+   * margin theo % được tính theo chiều rộng, nên dùng tỷ lệ headerHeight / width.
+   */
+  stitchedHeaderOffset(stitched: StitchedImage): string {
+    return `${(-100 * stitched.headerHeight / stitched.width).toFixed(3)}%`;
+  }
+
+  /**
+   * Nền giữ chỗ khi ảnh chưa tải: màu chủ đạo và ảnh mờ nhúng sẵn (nếu có),
+   * bị ảnh thật che đi khi tải xong.
+   */
+  placeholderStyle(meta?: ImageMeta | null): Record<string, string> {
+    const style: Record<string, string> = {};
+    if (meta?.dominantColor) {
+      style['background-color'] = meta.dominantColor;
+    }
+    if (meta?.placeholder) {
+      style['background-image'] = `url("${meta.placeholder}")`;
+    }
+    return style;
+  }
 }
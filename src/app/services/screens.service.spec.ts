@@ -45,4 +45,60 @@ describe('ScreensService', () => {
     service.setCurrentIndex(1);
     expect(service.isScrollableScreen).toBe(true);
   });
+
+  it('should pick the smallest JPEG candidate from srcset', () => {
+    const sources = [
+      { type: 'image/avif', srcset: 'a-360w.avif 360w, a-720w.avif 720w' },
+      { type: 'image/jpeg', srcset: 'a-720w.jpg 720w, a-360w.jpg 360w, a-1170w.jpg 1170w' }
+    ];
+
+    expect(service.getSmallestSrc(sources)).toBe('a-360w.jpg');
+    expect(service.getSmallestSrc([])).toBeNull();
+    expect(service.getSmallestSrc(undefined)).toBeNull();
+  });
+
+  it('should version image URLs with their content hash', () => {
+    const screen = service.applyContentHashes({
+      id: 'home',
+      src: 'home.jpg',
+      contentHash: 'abcdef0123456789',
+      sources: [{ type: 'image/jpeg', srcset: 'home-360w.jpg 360w, home-720w.jpg 720w' }],
+      images: ['home.jpg', 'home_1.jpg'],
+      imageMeta: [{ contentHash: 'abcdef0123456789' }, {}]
+    });
+
+    expect(screen.src).toBe('home.jpg?v=abcdef012345');
+    expect(screen.sources?.[0].srcset).toBe('home-360w.jpg?v=abcdef012345 360w, home-720w.jpg?v=abcdef012345 720w');
+    expect(screen.images).toEqual(['home.jpg?v=abcdef012345', 'home_1.jpg']);
+  });
+
+  it('should version stitched tiles with their own content hash', () => {
+    const screen = service.applyContentHashes({
+      id: 'feed',
+      src: 'feed.jpg',
+      stitched: {
+        width: 540, height: 3000, frameHeight: 1200, headerHeight: 0, footerHeight: 0, frameOffsets: [0, 600],
+        tiles: [
+          {
+            src: 'stitched/feed-0.jpg', y: 0, height: 2048, contentHash: '0123456789abcdef',
+            sources: [{ type: 'image/webp', srcset: 'feed-0-360w.webp 360w' }]
+          },
+          { src: 'stitched/feed-1.jpg', y: 2048, height: 952 }
+        ]
+      }
+    });
+
+    expect(screen.stitched?.tiles[0].src).toBe('stitched/feed-0.jpg?v=0123456789ab');
+    expect(screen.stitched?.tiles[0].sources?.[0].srcset).toBe('feed-0-360w.webp?v=0123456789ab 360w');
+    expect(screen.stitched?.tiles[1].src).toBe('stitched/feed-1.jpg');
+  });
+
+  it('should classify screens from precomputed dimensions without loading them', async () => {
+    const screens = await (service as any).processScreenTypes([
+      { id: 'tall', src: 'tall.jpg', width: 540, height: 2400 },
+      { id: 'wide', src: 'wide.jpg', width: 1200, height: 800 }
+    ]);
+
+    expect(screens.map((screen: any) => screen.type)).toEqual(['scrollable', 'static']);
+  });
 });
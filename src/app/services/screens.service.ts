@@ -1,12 +1,58 @@
 import { Injectable } from '@angular/core';
 import { BehaviorSubject, Observable } from 'rxjs';
 
-export interface Screen {
+/** Một định dạng ảnh đáp ứng (responsive), tương ứng với thẻ <source> trong <picture> */
+export interface ImageSource {
+  type: string;
+  srcset: string;
+}
+
+/** Một đoạn (tile) của ảnh dài đã ghép, bắt đầu tại hàng y */
+export interface StitchedTile {
+  src: string;
+  y: number;
+  height: number;
+  contentHash?: string;
+  sources?: ImageSource[];
+}
+
+/**
+ * Ảnh dài ghép từ các khung hình cuộn: header ghim chỉ xuất hiện một lần ở đầu,
+ * frameOffsets là vị trí cuộn của từng khung (theo thứ tự images), tính bằng pixel.
+ */
+export interface StitchedImage {
+  width: number;
+  height: number;
+  frameHeight: number;
+  headerHeight: number;
+  footerHeight: number;
+  frameOffsets: number[];
+  tiles: StitchedTile[];
+}
+
+/**
+ * Thông tin ảnh được tính sẵn khi xử lý: kích thước gốc, mã băm nội dung (dùng để
+ * cache lâu dài và làm mới URL khi ảnh đổi), màu chủ đạo và ảnh mờ nhúng sẵn
+ * (data URI) để hiển thị trước khi ảnh thật tải xong.
+ */
+export interface ImageMeta {
+  width?: number;
+  height?: number;
+  contentHash?: string;
+  dominantColor?: string;
+  placeholder?: string;
+}
+
+export interface Screen extends ImageMeta {
   src: string;
   id: string;
   type?: string;
   images?: string[];
   pinnedHeaderHeight?: string;
+  sources?: ImageSource[];
+  imageSources?: ImageSource[][];
+  stitched?: StitchedImage;
+  imageMeta?: ImageMeta[];
 }
 
 @Injectable({
@@ -25,7 +71,8 @@ export class ScreensService {
   async loadScreens(): Promise<void> {
     try {
       const res = await fetch('assets/screens.json');
-      this.screens = await res.json();
+      const screens: Screen[] = await res.json();
+      this.screens = screens.map(screen => this.applyContentHashes(screen));
 
       // Tự động phát hiện loại ảnh (dài/ngang) và cập nhật thông tin
       this.screens = await this.processScreenTypes(this.screens);
@@ -50,10 +97,17 @@ export class ScreensService {
     for (const screen of screens) {
       const processedScreen = { ...screen };
 
+      // Đã có kích thước từ screens.json: không cần tải ảnh để đo
+      if (screen.width && screen.height) {
+        this.applyAspectRatio(processedScreen, screen.height / screen.width);
+        processedScreens.push(processedScreen);
+        continue;
+      }
+
       try {
         // Tạo một ảnh ẩn để kiểm tra kích thước
         const img = new Image();
-        img.src = screen.src;
+        img.src = this.getSmallestSrc(screen.sources) || screen.src;
 
         // Set timeout để tránh chờ quá lâu
         const imageLoadPromise = new Promise<Screen>((resolve) => {
@@ -66,17 +120,7 @@ export class ScreensService {
           img.onload = () => {
             clearTimeout(timeout);
             try {
-              // Tính tỷ lệ khung hình: nếu chiều cao > 1.5 lần chiều rộng thì coi là ảnh scrollable
-              const aspectRatio = img.height / img.width;
-
-              // Nếu tỷ lệ > 1.5 (ảnh dài), đánh dấu là scrollable, ngược lại là static
-              if (aspectRatio > 1.5) {
-                processedScreen.type = 'scrollable';
-                // Xác định phần header nếu cần
-                processedScreen.pinnedHeaderHeight = processedScreen.pinnedHeaderHeight || '20%';
-              } else {
-                processedScreen.type = 'static';
-              }
+              this.applyAspectRatio(processedScreen, img.height / img.width);
             } catch (error) {
               console.warn(`Failed to process image dimensions for ${screen.src}:`, error);
               processedScreen.type = processedScreen.type || 'static';
@@ -107,6 +151,68 @@ export class ScreensService {
     return processedScreens;
   }
 
+  /** Tỷ lệ khung hình (cao / rộng) > 1.5 là ảnh dài (scrollable), ngược lại là static */
+  private applyAspectRatio(screen: Screen, aspectRatio: number): void {
+    if (aspectRatio > 1.5) {
+      screen.type = 'scrollable';
+      // Xác định phần header nếu cần
+      screen.pinnedHeaderHeight = screen.pinnedHeaderHeight || '20%';
+    } else {
+      screen.type = 'static';
+    }
+  }
+
+  /**
+   * Gắn mã băm nội dung vào URL ảnh (?v=...), để trình duyệt có thể cache ảnh
+   * vĩnh viễn mà vẫn tải lại khi ảnh được xử lý lại. Các bản đáp ứng (srcset)
+   * sinh ra từ cùng một ảnh nên dùng chung mã băm.
+   */
+  applyContentHashes(screen: Screen): Screen {
+    const versioned = { ...screen };
+
+    if (screen.contentHash) {
+      versioned.src = this.versionedUrl(screen.src, screen.contentHash);
+      versioned.sources = screen.sources?.map(source => this.versionedSource(source, screen.contentHash!));
+    }
+
+    if (screen.images && screen.imageMeta) {
+      versioned.images = screen.images.map((src, i) => this.versionedUrl(src, screen.imageMeta?.[i]?.contentHash));
+      versioned.imageSources = screen.imageSources?.map((sources, i) => {
+        const hash = screen.imageMeta?.[i]?.contentHash;
+        return hash ? sources.map(source => this.versionedSource(source, hash)) : sources;
+      });
+    }
+
+    // Tile ghép giữ tên cố định qua các lần chạy: gắn mã băm để không dùng lại tile cũ trong cache
+    if (screen.stitched) {
+      versioned.stitched = {
+        ...screen.stitched,
+        tiles: screen.stitched.tiles.map(tile => tile.contentHash ? {
+          ...tile,
+          src: this.versionedUrl(tile.src, tile.contentHash),
+          sources: tile.sources?.map(source => this.versionedSource(source, tile.contentHash!))
+        } : tile)
+      };
+    }
+
+    return versioned;
+  }
+
+  private versionedUrl(url: string, hash?: string): string {
+    return hash ? `${url}${url.includes('?') ? '&' : '?'}v=${hash.slice(0, 12)}` : url;
+  }
+
+  private versionedSource(source: ImageSource, hash: string): ImageSource {
+    const srcset = source.srcset
+      .split(',')
+      .map(candidate => {
+        const [url, ...descriptors] = candidate.trim().split(/\s+/);
+        return [this.versionedUrl(url, hash), ...descriptors].join(' ');
+      })
+      .join(', ');
+    return { ...source, srcset };
+  }
+
   private async getInitialScreenId(): Promise<string> {
     try {
       const workflowRes = await fetch('assets/workflows.json');
@@ -118,6 +224,29 @@ export class ScreensService {
     }
   }
 
+  /**
+   * Chọn ảnh nhỏ nhất trong srcset (ưu tiên JPEG vì mọi trình duyệt đều hỗ trợ).
+   * Chỉ dùng để đo tỷ lệ khung hình mà không phải tải ảnh gốc.
+   */
+  getSmallestSrc(sources?: ImageSource[]): string | null {
+    if (!sources?.length) {
+      return null;
+    }
+
+    const source = sources.find(s => s.type === 'image/jpeg') || sources[sources.length - 1];
+    let smallest: { url: string; width: number } | null = null;
+
+    for (const candidate of source.srcset.split(',')) {
+      const [url, descriptor] = candidate.trim().split(/\s+/);
+      const width = parseInt(descriptor, 10);
+      if (url && !isNaN(width) && (!smallest || width < smallest.width)) {
+        smallest = { url, width };
+      }
+    }
+
+    return smallest?.url || null;
+  }
+
   getScreens(): Screen[] {
     return [...this.screens];
   }